@@ -1,6 +1,6 @@
 {
     'name': 'Odoo Blockchain Certification eLearning',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.6.0',
     'category': 'Website/eLearning',
     'summary': 'Certificación blockchain de cursos',
     'description': """
@@ -26,8 +26,13 @@
     ],
     'data': [
         'security/ir.model.access.csv',
+        'data/product_attribute_data.xml',
+        'data/ir_cron_data.xml',
         'views/slide_channel_views.xml',
         'views/slide_slide_views.xml',
+        'views/survey_certificate_anchor_views.xml',
+        'views/survey_survey_views.xml',
+        'views/survey_user_input_views.xml',
         'views/website_sale_slides_overrides.xml',
     ],
     'installable': True,
@@ -1,2 +1,5 @@
 # -*- coding: utf-8 -*-
 from . import main
+from . import verification
+from . import metrics
+from . import export
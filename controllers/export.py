@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from odoo import api, http
+from odoo.http import request
+from odoo.modules.registry import Registry
+from odoo.osv import expression
+
+from ..tools.export import decode_id_ranges, iter_csv, iter_json
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'json': (iter_json, 'application/json; charset=utf-8'),
+}
+
+
+def _stream_certificate_proofs(dbname, uid, context, domain, serializer):
+    """
+    El cursor de la petición se cierra al devolver la respuesta: el generador abre el suyo
+    (de solo lectura) y lo mantiene mientras el cliente descarga.
+    """
+    with Registry(dbname).cursor(readonly=True) as cr:
+        env = api.Environment(cr, uid, context)
+        yield from serializer(env['survey.user_input']._iter_certificate_proofs(domain))
+
+
+class CertificateProofExport(http.Controller):
+
+    @http.route(['/certificate/proofs/export'], type='http', auth='user', methods=['GET'])
+    def certificate_proofs_export(self, format='csv', ids=None, survey_id=None, anchor_id=None, **kwargs):
+        """
+        Exportación en streaming (CSV o JSON) del hash, la transacción y la prueba Merkle de
+        cohortes completas de certificados, para verificarlas offline sin descargar los PDFs.
+        Filtros: 'ids' (rangos "1-500,612"), 'survey_id' y/o 'anchor_id'.
+        """
+        if format not in EXPORT_FORMATS:
+            return request.make_response("Formato no soportado.", status=400)
+        try:
+            domain = []
+            if ids:
+                domain = expression.AND([domain, expression.OR([
+                    ['&', ('id', '>=', start), ('id', '<=', end)] for start, end in decode_id_ranges(ids)
+                ])])
+            if survey_id:
+                domain = expression.AND([domain, [('survey_id', '=', int(survey_id))]])
+            if anchor_id:
+                domain = expression.AND([domain, [('blockchain_anchor_id', '=', int(anchor_id))]])
+        except ValueError:
+            return request.make_response("Filtro no válido.", status=400)
+
+        request.env['survey.user_input'].check_access('read')
+        serializer, content_type = EXPORT_FORMATS[format]
+        return request.make_response(
+            _stream_certificate_proofs(request.db, request.env.uid, dict(request.env.context), domain, serializer),
+            headers=[
+                ('Content-Type', content_type),
+                ('Content-Disposition', f'attachment; filename="certificate_proofs.{format}"'),
+            ],
+        )
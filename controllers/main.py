@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 from odoo import http
-from odoo.http import request, content_disposition
+from odoo.http import Stream, request
 from odoo.addons.survey.controllers.main import Survey
-import base64
 import logging
 
+from ..tools.metrics import metrics, span
+
 _logger = logging.getLogger(__name__)
 
 class SurveyBlockchain(Survey):
@@ -15,6 +16,10 @@ class SurveyBlockchain(Survey):
         Sobrescribe la ruta de descarga para servir SIEMPRE la versión inmutable
         guardada en blockchain (si existe), garantizando que el hash coincida.
         """
+        with span('download'):
+            return self._get_blockchain_certification_response(survey_id, **kwargs)
+
+    def _get_blockchain_certification_response(self, survey_id, **kwargs):
         _logger.info("Interceptando descarga de certificado para Survey ID: %s", survey_id)
         
         # Copia de la lógica original para encontrar el intento exitoso
@@ -37,22 +42,45 @@ class SurveyBlockchain(Survey):
             # Fallback a lógica original que levantará UserError si no hay éxito
             return super(SurveyBlockchain, self).survey_get_certification(survey_id, **kwargs)
 
+        # Certificado archivado en frío: se sirve desde la caché LRU sin devolverlo al filestore
+        certificate_file = succeeded_attempt.blockchain_certificate_file_id
+        if certificate_file.storage_state == 'archived':
+            pdf_content = certificate_file._get_archived_contents()
+            _logger.info("✅ SIRVIENDO CERTIFICADO ARCHIVADO (Fichero ID: %s)", certificate_file.id)
+            stream = Stream(
+                type='data',
+                data=pdf_content,
+                size=len(pdf_content),
+                mimetype='application/pdf',
+                # Mismo nombre que el adjunto en vivo (archivados antes de guardarlo: el que tendría)
+                download_name=certificate_file.attachment_name
+                or succeeded_attempt._prepare_certificate_attachment_vals()['name'],
+                etag=certificate_file.sha256,
+                conditional=True,
+            )
+            metrics.inc('download_total', source='archived')
+            return stream.get_response(as_attachment=True)
+
         # Verificar si hay una versión inmutable blockchain vinculada (búsqueda por adjunto)
         if hasattr(succeeded_attempt, '_get_immutable_certificate_attachment'):
             attachment = succeeded_attempt._get_immutable_certificate_attachment()
             
             if attachment:
                 _logger.info("✅ SIRVIENDO CERTIFICADO INMUTABLE (Adjunto ID: %s)", attachment.id)
-                pdf_content = base64.b64decode(attachment.datas)
-                report_content_disposition = content_disposition(attachment.name or 'Certification.pdf')
-                
-                return request.make_response(pdf_content, headers=[
-                    ('Content-Type', 'application/pdf'),
-                    ('Content-Length', len(pdf_content)),
-                    ('Content-Disposition', report_content_disposition),
-                ])
+                # Streaming directo desde el filestore (X-Sendfile/X-Accel-Redirect si está configurado).
+                # El PDF es inmutable: su hash SHA-256 es un ETag fuerte, lo que habilita 304 y rangos.
+                stream = request.env['ir.binary']._get_stream_from(
+                    attachment, 'raw',
+                    filename=attachment.name or 'Certification.pdf',
+                    mimetype='application/pdf',
+                )
+                if succeeded_attempt.blockchain_certificate_hash:
+                    stream.etag = succeeded_attempt.blockchain_certificate_hash
+                metrics.inc('download_total', source='immutable')
+                return stream.get_response(as_attachment=True)
             else:
                  _logger.info("⚠️ No se encontró adjunto inmutable para intento exitoso %s", succeeded_attempt.id)
         
         _logger.info("⚡ Generando certificado dinámico")
+        metrics.inc('download_total', source='dynamic')
         return super(SurveyBlockchain, self).survey_get_certification(survey_id, **kwargs)
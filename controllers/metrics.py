@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from odoo import http
+from odoo.http import request
+import hmac
+
+from ..tools.metrics import metrics
+
+
+class CertificateMetrics(http.Controller):
+
+    @http.route(['/certificate/metrics'], type='http', auth='public', methods=['GET'], csrf=False, save_session=False)
+    def certificate_metrics(self, token=None, **kwargs):
+        """
+        Métricas de emisión de certificados en formato de texto de Prometheus.
+        Requiere el parámetro 'elearning_blockchain_certification.metrics_token', enviado como
+        '?token=' o cabecera 'Authorization: Bearer'; sin él configurado la ruta no existe.
+        """
+        expected = request.env['ir.config_parameter'].sudo().get_param(
+            'elearning_blockchain_certification.metrics_token')
+        if not expected:
+            return request.not_found()
+        authorization = request.httprequest.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            token = authorization[len('Bearer '):]
+        if not token or not hmac.compare_digest(token, expected):
+            return request.make_response('Forbidden', status=403)
+
+        queue = request.env['survey.user_input'].sudo()._read_group(
+            [('blockchain_certificate_state', '!=', False)],
+            ['blockchain_certificate_state'], ['__count'],
+        )
+        body = metrics.render(extra_gauges={
+            'pipeline_queue': [({'state': state}, count) for state, count in queue],
+        })
+        return request.make_response(body, headers=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')])
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from odoo import http
+from odoo.http import request
+from odoo.tools.lru import LRU
+import hashlib
+import logging
+import re
+import time
+
+_logger = logging.getLogger(__name__)
+
+HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+# Lectura del PDF subido por bloques para no cargarlo entero en memoria
+HASH_CHUNK_SIZE = 64 * 1024
+# Solo se cachean verificaciones positivas: un certificado emitido no deja de existir,
+# pero uno inexistente puede emitirse en cualquier momento.
+VERIFICATION_CACHE_TTL = 300
+_verification_cache = LRU(4096)
+
+
+class CertificateVerification(http.Controller):
+
+    @http.route(['/certificate/verify'], type='http', auth='public', methods=['GET', 'POST'], csrf=False)
+    def certificate_verify(self, certificate=None, **kwargs):
+        """
+        Verificación pública de certificados: acepta el PDF ('certificate') o su hash SHA-256
+        en hexadecimal ('hash') y devuelve en JSON el certificado y el estado de su anclaje.
+        Con solo el hash no se revela el titular: los hashes están publicados en cadena.
+        """
+        with_holder = certificate is not None and hasattr(certificate, 'read')
+        if with_holder:
+            sha256 = hashlib.sha256()
+            for chunk in iter(lambda: certificate.read(HASH_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+            hash_hex = sha256.hexdigest()
+        else:
+            hash_hex = (kwargs.get('hash') or '').strip().lower()
+
+        if not HASH_RE.match(hash_hex):
+            return request.make_json_response(
+                {'valid': False, 'error': "Se requiere un PDF o un hash SHA-256 en hexadecimal."}, status=400)
+
+        cache_key = (request.db, hash_hex, with_holder)
+        cached = _verification_cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return request.make_json_response(cached[1])
+
+        result = request.env['survey.user_input'].sudo()._get_certificate_verification(hash_hex, with_holder=with_holder)
+        if not result['valid']:
+            _logger.info("Verificación pública sin coincidencia para hash %s", hash_hex)
+            return request.make_json_response(result, status=404)
+
+        _verification_cache[cache_key] = (time.monotonic() + VERIFICATION_CACHE_TTL, result)
+        return request.make_json_response(result)
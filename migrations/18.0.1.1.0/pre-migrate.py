@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+El atributo "Certificación Blockchain" y sus valores se creaban buscando por nombre.
+Ahora son datos XML: vinculamos los registros existentes a sus XML IDs para que la
+carga de datos no cree duplicados y las variantes ya vendidas sigan apuntando a ellos.
+"""
+MODULE = 'elearning_blockchain_certification'
+
+
+def _register_xmlid(cr, name, model, res_id):
+    cr.execute("""
+        INSERT INTO ir_model_data (module, name, model, res_id, noupdate)
+        VALUES (%s, %s, %s, %s, true)
+        ON CONFLICT DO NOTHING
+    """, [MODULE, name, model, res_id])
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        SELECT id FROM product_attribute
+        WHERE name->>'en_US' = %s
+        ORDER BY id LIMIT 1
+    """, ['Certificación Blockchain'])
+    row = cr.fetchone()
+    if not row:
+        return
+    attribute_id = row[0]
+    _register_xmlid(cr, 'product_attribute_blockchain_certification', 'product.attribute', attribute_id)
+
+    for xmlid, value_name in (
+        ('product_attribute_value_standard', 'Estándar'),
+        ('product_attribute_value_blockchain', 'Certificado Blockchain'),
+    ):
+        cr.execute("""
+            SELECT id FROM product_attribute_value
+            WHERE attribute_id = %s AND name->>'en_US' = %s
+            ORDER BY id LIMIT 1
+        """, [attribute_id, value_name])
+        row = cr.fetchone()
+        if row:
+            _register_xmlid(cr, xmlid, 'product.attribute.value', row[0])
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Los certificados inmutables pasan a un almacén indexado por SHA-256 (survey.certificate.file).
+Registramos los adjuntos existentes usando el hash ya guardado en cada participación,
+sin releer ni recalcular los PDFs.
+
+Al actualizar desde una versión anterior la tabla se crea vacía y el ORM ya aplica
+NOT NULL a las columnas obligatorias: el INSERT debe rellenarlas todas. Los PDFs
+existentes (QWeb) no son reproducibles y siguen en el filestore.
+"""
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        INSERT INTO survey_certificate_file (sha256, attachment_id, file_size, integrity_state,
+                                             storage_state, reproducibility, stored_date,
+                                             create_uid, create_date, write_uid, write_date)
+        SELECT DISTINCT ON (ui.blockchain_certificate_hash)
+               ui.blockchain_certificate_hash, att.id, att.file_size, 'unchecked',
+               'stored', 'not_reproducible', att.create_date,
+               1, now() at time zone 'UTC', 1, now() at time zone 'UTC'
+          FROM survey_user_input ui
+          JOIN ir_attachment att
+            ON att.res_model = 'survey.user_input'
+           AND att.res_id = ui.id
+           AND att.description = 'Certificado Blockchain Inmutable'
+         WHERE ui.blockchain_certificate_hash IS NOT NULL
+      ORDER BY ui.blockchain_certificate_hash, att.id
+            ON CONFLICT DO NOTHING
+    """)
+    cr.execute("""
+        UPDATE survey_user_input ui
+           SET blockchain_certificate_file_id = f.id
+          FROM survey_certificate_file f
+         WHERE f.sha256 = ui.blockchain_certificate_hash
+           AND ui.blockchain_certificate_file_id IS NULL
+    """)
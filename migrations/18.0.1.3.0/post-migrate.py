@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+Clave de idempotencia del registro en cadena para los certificados que ya tenían hash,
+con la misma fórmula que SurveyUserInput._get_certificate_issuance_key.
+"""
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        UPDATE survey_user_input ui
+           SET blockchain_issuance_key = encode(sha256(convert_to(
+                   p.value || ':survey.user_input:' || ui.id || ':' || ui.blockchain_certificate_hash, 'UTF8')), 'hex')
+          FROM ir_config_parameter p
+         WHERE p.key = 'database.uuid'
+           AND ui.blockchain_certificate_hash IS NOT NULL
+           AND ui.blockchain_issuance_key IS NULL
+    """)
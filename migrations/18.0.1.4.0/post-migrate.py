@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+El correo de certificación pasa a esperar la confirmación de la transacción.
+Los certificados y lotes ya registrados antes del seguimiento se dan por confirmados
+para que los pendientes de envío no se queden retenidos.
+"""
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        UPDATE survey_user_input
+           SET blockchain_confirmation_state = 'confirmed'
+         WHERE blockchain_certificate_state IN ('registered', 'mailed')
+           AND blockchain_confirmation_state IS NULL
+    """)
+    cr.execute("""
+        UPDATE survey_certificate_anchor
+           SET blockchain_confirmation_state = 'confirmed'
+         WHERE state = 'registered'
+           AND blockchain_confirmation_state IS NULL
+    """)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Los ficheros de certificado pasan a tener estado de almacenamiento y de reproducibilidad,
+ambos obligatorios. Los existentes están en el filestore y no tienen datos de emisión
+fijados, así que no son reproducibles: se rellenan antes de que el ORM aplique NOT NULL,
+para que el desalojo no intente regenerarlos y las descargas no intenten rehidratarlos.
+Su fecha de almacenamiento pasa a ser la de creación del fichero.
+
+Al actualizar desde antes de 18.0.1.2.0 la tabla aún no existe: el post-migrate de esa
+versión ya inserta los ficheros con estos valores.
+"""
+from odoo.tools.sql import column_exists, create_column, table_exists
+
+TABLE = 'survey_certificate_file'
+
+
+def migrate(cr, version):
+    if not version or not table_exists(cr, TABLE):
+        return
+
+    for column, column_type in (
+        ('storage_state', 'varchar'),
+        ('reproducibility', 'varchar'),
+        ('stored_date', 'timestamp'),
+    ):
+        if not column_exists(cr, TABLE, column):
+            create_column(cr, TABLE, column, column_type)
+
+    cr.execute("""
+        UPDATE survey_certificate_file
+           SET storage_state = COALESCE(storage_state, 'stored'),
+               reproducibility = 'not_reproducible',
+               stored_date = COALESCE(stored_date, create_date)
+    """)
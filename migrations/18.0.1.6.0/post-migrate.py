@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+El envío del correo de certificación pasa a quedar marcado en la participación
+(blockchain_certificate_mailed). Los certificados ya enviados se marcan para que un
+re-anclaje o un reintento posterior no lo repita.
+"""
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        UPDATE survey_user_input
+           SET blockchain_certificate_mailed = true
+         WHERE blockchain_certificate_state = 'mailed'
+    """)
@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
 
+from . import ir_attachment
+from . import mail_template
+from . import product_template
 from . import sale_order
 from . import slide_channel
 from . import slide_channel_partner
 from . import slide_slide
+from . import survey_certificate_confirmation
+from . import survey_certificate_anchor
+from . import survey_certificate_file
+from . import survey_survey
 from . import survey_user_input
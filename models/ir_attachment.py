@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Extensión de ir.attachment para que borrar un adjunto del almacén de certificados
+(al borrar su participación o su encuesta, o a mano) no choque con la clave foránea
+de survey.certificate.file.
+"""
+from odoo import models
+
+
+class IrAttachment(models.Model):
+    _inherit = 'ir.attachment'
+
+    def unlink(self):
+        self.env['survey.certificate.file'].sudo()._release_attachments(self)
+        return super().unlink()
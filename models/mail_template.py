@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Extensión de mail.template para retener el correo de certificación
+de los intentos que se emiten por el pipeline blockchain y adjuntarles
+su PDF inmutable sin volver a renderizar el informe.
+"""
+from odoo import models
+
+
+class MailTemplate(models.Model):
+    _inherit = 'mail.template'
+
+    def send_mail(self, res_id, force_send=False, raise_exception=False, email_values=None, email_layout_xmlid=False):
+        """
+        Si el intento está en 'blockchain_certificate_deferred_ids' (ver SurveyUserInput._mark_done)
+        no se envía ahora: el pipeline lo enviará con el PDF inmutable ya generado.
+        """
+        deferred_ids = self.env.context.get('blockchain_certificate_deferred_ids')
+        if deferred_ids and self.model == 'survey.user_input' and res_id in deferred_ids:
+            return False
+        return super().send_mail(
+            res_id,
+            force_send=force_send,
+            raise_exception=raise_exception,
+            email_values=email_values,
+            email_layout_xmlid=email_layout_xmlid,
+        )
+
+    def _generate_template_attachments(self, res_ids, render_fields, render_results=None):
+        """
+        Los registros de 'blockchain_certificate_attachments' ({res_id: attachment_id}) llevan
+        su PDF inmutable en lugar de los informes de la plantilla, que no se renderizan.
+        """
+        certificate_attachments = self.env.context.get('blockchain_certificate_attachments')
+        if not certificate_attachments or self.model != 'survey.user_input':
+            return super()._generate_template_attachments(res_ids, render_fields, render_results=render_results)
+
+        if render_results is None:
+            render_results = {}
+        other_ids = [res_id for res_id in res_ids if res_id not in certificate_attachments]
+        if other_ids:
+            super()._generate_template_attachments(other_ids, render_fields, render_results=render_results)
+        for res_id in res_ids:
+            if res_id in certificate_attachments:
+                values = render_results.setdefault(res_id, {})
+                static_ids = self.attachment_ids.ids if 'attachment_ids' in render_fields else []
+                values['attachment_ids'] = static_ids + [certificate_attachments[res_id]]
+        return render_results
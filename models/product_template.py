@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+Extensión de product.template con los cursos vinculados a cualquiera de sus variantes.
+"""
+from odoo import models, fields, api
+
+
+class ProductTemplate(models.Model):
+    _inherit = 'product.template'
+
+    course_channel_ids = fields.Many2many(
+        'slide.channel', 'product_template_course_channel_rel', 'product_tmpl_id', 'channel_id',
+        string='Cursos', compute='_compute_course_channel_ids', store=True,
+        help='Cursos vinculados a cualquier variante del producto. El canal apunta a una sola variante '
+             '(normalmente la estándar), pero se accede comprando cualquiera de ellas.')
+
+    @api.depends('product_variant_ids.channel_ids')
+    def _compute_course_channel_ids(self):
+        # También las variantes archivadas: un pedido presupuestado antes de archivar la variante
+        # sigue dando acceso al curso al confirmarse
+        for template in self:
+            variants = template.with_context(active_test=False).product_variant_ids
+            template.course_channel_ids = variants.with_context(active_test=True).channel_ids
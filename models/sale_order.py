@@ -3,6 +3,7 @@
 Extensión de sale.order para solucionar el problema de acceso a cursos.
 """
 from odoo import models, fields, api
+from collections import defaultdict
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -13,6 +14,7 @@ class SaleOrder(models.Model):
     def _action_confirm(self):
         """
         Override para garantizar acceso al curso y configurar derechos de certificación.
+        Resolución por conjuntos: el número de consultas no crece con las líneas del pedido.
         """
         _logger.info(">>> ELEARNING BLOCKCHAIN: Ejecutando _action_confirm <<<")
         
@@ -20,54 +22,65 @@ class SaleOrder(models.Model):
         result = super(SaleOrder, self)._action_confirm()
 
         # 2. Lógica adicional: Buscar cursos por Template
-        so_lines = self.env['sale.order.line'].search([('order_id', 'in', self.ids)])
-        products = so_lines.mapped('product_id')
-        purchased_templates = products.mapped('product_tmpl_id')
+        so_lines = self.order_line
+        products = so_lines.product_id
+        purchased_templates = products.product_tmpl_id
+
+        # 3. Mapas precalculados: template -> canales pagados (campo almacenado en el template)
+        channels_per_template = {
+            template.id: template.course_channel_ids.filtered(lambda c: c.enroll == 'payment')
+            for template in purchased_templates.sudo()
+        }
+        channels = self.env['slide.channel'].sudo().union(*channels_per_template.values())
 
-        # Buscar canales pagados vinculados a los templates comprados
-        channels = self.env['slide.channel'].sudo().search([
-            ('enroll', '=', 'payment'),
-            ('product_id.product_tmpl_id', 'in', purchased_templates.ids)
-        ])
-        
         if not channels:
             return result
 
-        channels_per_so = {sale_order: self.env['slide.channel'] for sale_order in self}
-        
+        # Verificar si compró la variante blockchain
+        # Comparamos por ID del valor "Certificado Blockchain" (independiente de la traducción)
+        _attr_id, _val_std_id, val_cert_id = self.env['slide.channel']._get_blockchain_attribute_ids()
+        blockchain_variant_ids = set(products.filtered(
+            lambda p: val_cert_id in p.product_template_attribute_value_ids.product_attribute_value_id.ids
+        ).ids)
+
+        # 4. Derechos por (canal, alumno)
+        # Si el pedido incluye ambas variantes del mismo curso prevalece la blockchain.
+        rights = {}
+        partners_per_channel = defaultdict(set)
         for so_line in so_lines:
-            product_tmpl = so_line.product_id.product_tmpl_id
-            matching_channels = channels.filtered(
-                lambda c: c.product_id.product_tmpl_id == product_tmpl
-            )
-            
-            if matching_channels:
-                channels_per_so[so_line.order_id] |= matching_channels
-                
-                # --- NUEVA LÓGICA DE DERECHOS ---
-                # Verificar si compró la variante blockchain
-                # Usamos el nombre del valor del atributo para detectar si es "Certificado Blockchain"
-                is_blockchain_variant = False
-                for ptav in so_line.product_id.product_template_attribute_value_ids:
-                    if ptav.attribute_id.name == 'Certificación Blockchain' and ptav.name == 'Certificado Blockchain':
-                        is_blockchain_variant = True
-                        break
-                
-                # Actualizar derechos en la inscripción
-                for channel in matching_channels:
-                    # Asegurar que el usuario está inscrito (si no lo hizo el super)
-                    channel.sudo()._action_add_members(so_line.order_id.partner_id)
-                    
-                    enrollment = self.env['slide.channel.partner'].sudo().search([
-                        ('channel_id', '=', channel.id),
-                        ('partner_id', '=', so_line.order_id.partner_id.id)
-                    ], limit=1)
-                    
-                    if enrollment:
-                        # SETEAMOS explícitamente True o False.
-                        # Esto corrige re-inscripciones: Si paga estándar, pierde derechos antiguos.
-                        enrollment.write({'blockchain_certification_rights': is_blockchain_variant})
-                        _logger.info("Derechos Blockchain para %s en curso %s: %s", 
-                                     so_line.order_id.partner_id.name, channel.name, is_blockchain_variant)
+            matching_channels = channels_per_template.get(so_line.product_id.product_tmpl_id.id)
+            if not matching_channels:
+                continue
+            partner_id = so_line.order_id.partner_id.id
+            is_blockchain_variant = so_line.product_id.id in blockchain_variant_ids
+            for channel in matching_channels:
+                partners_per_channel[channel.id].add(partner_id)
+                rights[channel.id, partner_id] = rights.get((channel.id, partner_id), False) or is_blockchain_variant
+
+        # 5. Asegurar que el usuario está inscrito (si no lo hizo el super)
+        # Una llamada por grupo de canales que comparten los mismos alumnos.
+        channels_per_partners = defaultdict(list)
+        for channel_id, partner_ids in partners_per_channel.items():
+            channels_per_partners[frozenset(partner_ids)].append(channel_id)
+        for partner_ids, channel_ids in channels_per_partners.items():
+            channels.browse(channel_ids)._action_add_members(self.env['res.partner'].browse(partner_ids))
+
+        # 6. Actualizar derechos en la inscripción con escrituras agrupadas
+        # SETEAMOS explícitamente True o False.
+        # Esto corrige re-inscripciones: Si paga estándar, pierde derechos antiguos.
+        enrollments = self.env['slide.channel.partner'].sudo().search([
+            ('channel_id', 'in', list(partners_per_channel)),
+            ('partner_id', 'in', list({partner_id for _channel_id, partner_id in rights}))
+        ])
+        enrollments_by_right = defaultdict(lambda: self.env['slide.channel.partner'].sudo())
+        for enrollment in enrollments:
+            right = rights.get((enrollment.channel_id.id, enrollment.partner_id.id))
+            if right is not None and enrollment.blockchain_certification_rights != right:
+                enrollments_by_right[right] |= enrollment
+        for right, to_update in enrollments_by_right.items():
+            to_update.write({'blockchain_certification_rights': right})
+
+        _logger.info("Derechos Blockchain actualizados: %s concedidos, %s retirados (%s inscripciones)",
+                     len(enrollments_by_right[True]), len(enrollments_by_right[False]), len(rights))
 
         return result
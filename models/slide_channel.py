@@ -2,8 +2,9 @@
 """
 Extensión de slide.channel para gestionar Variantes de Producto Blockchain.
 """
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
+from collections import defaultdict
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -44,92 +45,100 @@ class SlideChannel(models.Model):
     # GESTIÓN DE VARIANTES
     # -------------------------------------------------------------------------
     
+    @api.model
+    @tools.ormcache()
+    def _get_blockchain_attribute_ids(self):
+        """
+        IDs (atributo, valor estándar, valor certificado) resueltos por XML ID.
+        Cacheado: la sincronización de cursos y la confirmación de pedidos no repiten búsquedas.
+        """
+        IrModelData = self.env['ir.model.data']
+        return tuple(
+            IrModelData._xmlid_to_res_id(f'elearning_blockchain_certification.{xmlid}', raise_if_not_found=True)
+            for xmlid in (
+                'product_attribute_blockchain_certification',
+                'product_attribute_value_standard',
+                'product_attribute_value_blockchain',
+            )
+        )
+
     def _get_blockchain_attribute(self):
-        """Busca o crea el atributo y sus valores."""
-        Attribute = self.env['product.attribute']
+        """Devuelve el atributo y sus valores (datos XML del módulo)."""
+        attr_id, val_std_id, val_cert_id = self._get_blockchain_attribute_ids()
         AttributeValue = self.env['product.attribute.value']
-        
-        # 1. Buscar/Crear Atributo
-        attr = Attribute.search([('name', '=', 'Certificación Blockchain')], limit=1)
-        if not attr:
-            attr = Attribute.create({
-                'name': 'Certificación Blockchain',
-                'create_variant': 'always', # Crear variantes inmediatamente
-                'display_type': 'radio',
-            })
-            
-        # 2. Buscar/Crear Valores
-        
-        # Valor estandar
-        val_std = AttributeValue.search([('attribute_id', '=', attr.id), ('name', '=', 'Estándar')], limit=1)
-        if not val_std:
-            val_std = AttributeValue.create({'attribute_id': attr.id, 'name': 'Estándar', 'sequence': 1})
-            
-        # Valor certificado
-        val_cert = AttributeValue.search([('attribute_id', '=', attr.id), ('name', '=', 'Certificado Blockchain')], limit=1)
-        if not val_cert:
-            val_cert = AttributeValue.create({'attribute_id': attr.id, 'name': 'Certificado Blockchain', 'sequence': 2})
-            
-        return attr, val_std, val_cert
+        return (
+            self.env['product.attribute'].browse(attr_id),
+            AttributeValue.browse(val_std_id),
+            AttributeValue.browse(val_cert_id),
+        )
 
     def _update_product_variants(self):
-        """Configura el producto del curso con los atributos."""
-        self.ensure_one()
-        if not self.product_id:
+        """
+        Configura el producto del curso con los atributos.
+        Trabaja por recordset: los canales que comparten template se procesan juntos y
+        solo se escriben los valores que realmente cambian.
+        """
+        channels = self.filtered('product_id')
+        if not channels:
             return
 
-        tmpl = self.product_id.product_tmpl_id
         attr, val_std, val_cert = self._get_blockchain_attribute()
-        
-        # Verificar si ya tiene la línea de atributo
-        line = tmpl.attribute_line_ids.filtered(lambda l: l.attribute_id == attr)
-        
-        if self.blockchain_certification_enabled:
-            # SI está habilitado: Asegurar que existe línea con ambos valores
-            if not line:
-                tmpl.write({
-                    'attribute_line_ids': [(0, 0, {
-                        'attribute_id': attr.id,
-                        'value_ids': [(6, 0, [val_std.id, val_cert.id])]
-                    })]
-                })
+        channels_per_template = defaultdict(lambda: self.env['slide.channel'])
+        for channel in channels:
+            channels_per_template[channel.product_id.product_tmpl_id] |= channel
+
+        # price_extra -> PTAVs, para escribir una vez por precio distinto
+        ptavs_per_price = defaultdict(lambda: self.env['product.template.attribute.value'])
+        for tmpl, tmpl_channels in channels_per_template.items():
+            # Verificar si ya tiene la línea de atributo
+            line = tmpl.attribute_line_ids.filtered(lambda l: l.attribute_id == attr)
+            enabled_channels = tmpl_channels.filtered('blockchain_certification_enabled')
+
+            if enabled_channels:
+                # SI está habilitado: Asegurar que existe línea con ambos valores
+                if not line:
+                    tmpl.write({
+                        'attribute_line_ids': [(0, 0, {
+                            'attribute_id': attr.id,
+                            'value_ids': [(6, 0, [val_std.id, val_cert.id])]
+                        })]
+                    })
+                else:
+                    # Actualizar valores si faltan (asegurar ambos)
+                    to_add = (val_std | val_cert) - line.value_ids
+                    if to_add:
+                        line.write({'value_ids': [(4, vid) for vid in to_add.ids]})
+
+                # CONFIGURAR PRECIO EXTRA
+                # Si varios cursos comparten template prevalece el último, como en una edición secuencial.
+                price = enabled_channels[-1].blockchain_certification_price
+            elif line:
+                # NO habilitado: Poner precio extra a 0
+                price = 0.0
             else:
-                # Actualizar valores si faltan (asegurar ambos)
-                current_val_ids = line.value_ids.ids
-                to_add = []
-                if val_std.id not in current_val_ids:
-                    to_add.append(val_std.id)
-                if val_cert.id not in current_val_ids:
-                    to_add.append(val_cert.id)
-                
-                if to_add:
-                    line.write({'value_ids': [(4, vid) for vid in to_add]})
-            
-            # CONFIGURAR PRECIO EXTRA
+                continue
+
             ptav = tmpl.valid_product_template_attribute_line_ids.product_template_value_ids.filtered(
-                lambda v: v.product_attribute_value_id == val_cert
+                lambda v: v.product_attribute_value_id == val_cert and v.price_extra != price
             )
-            if ptav:
-                ptav.write({'price_extra': self.blockchain_certification_price})
-            
+            ptavs_per_price[price] |= ptav
+
             # --- CORRECCIÓN DE DISPONIBILIDAD ---
             # Al crear variantes, el product_id original del channel puede quedar obsoleto o archivado.
             # Debemos re-apuntar el channel.product_id a la variante "Estándar".
-            variant_std = tmpl.product_variant_ids.filtered(
-                lambda p: val_std in p.product_template_attribute_value_ids.product_attribute_value_id
-            )
-            if variant_std:
-                # Usamos la primera coincidencia (debería ser única por combinación de atributos)
-                self.product_id = variant_std[0].id
-
-        else:
-            # NO habilitado: Poner precio extra a 0
-            if line:
-                 ptav = tmpl.valid_product_template_attribute_line_ids.product_template_value_ids.filtered(
-                    lambda v: v.product_attribute_value_id == val_cert
+            if enabled_channels:
+                variant_std = tmpl.product_variant_ids.filtered(
+                    lambda p: val_std in p.product_template_attribute_value_ids.product_attribute_value_id
                 )
-                 if ptav:
-                     ptav.write({'price_extra': 0.0})
+                if variant_std:
+                    # Usamos la primera coincidencia (debería ser única por combinación de atributos)
+                    to_repoint = enabled_channels.filtered(lambda c: c.product_id != variant_std[0])
+                    if to_repoint:
+                        to_repoint.write({'product_id': variant_std[0].id})
+
+        for price, ptavs in ptavs_per_price.items():
+            if ptavs:
+                ptavs.write({'price_extra': price})
 
     def _sync_course_product(self):
         """ 
@@ -137,13 +146,17 @@ class SlideChannel(models.Model):
         Asegura que se cree un producto incluso si el curso es gratuito pero tiene certificación de pago.
         """
         super()._sync_course_product()
-        
-        Product = self.env['product.product']
-        for channel in self:
-            # Caso Especial: Curso gratuito/público pero con certificación blockchain de pago.
-            # elearning_academy solo crea producto si enroll == 'payment'.
-            # Aquí forzamos la creación si hay precio de certificación.
-            if not channel.product_id and channel.blockchain_certification_enabled and channel.blockchain_certification_price > 0:
+
+        # Caso Especial: Curso gratuito/público pero con certificación blockchain de pago.
+        # elearning_academy solo crea producto si enroll == 'payment'.
+        # Aquí forzamos la creación si hay precio de certificación.
+        without_product = self.filtered(
+            lambda c: not c.product_id and c.blockchain_certification_enabled and c.blockchain_certification_price > 0
+        )
+        if without_product:
+            category = self.env.ref('product.product_category_all', raise_if_not_found=False)
+            product_vals_list = []
+            for channel in without_product:
                 product_vals = {
                     'name': channel.name,
                     'list_price': 0.0, # El curso base es gratis
@@ -152,49 +165,70 @@ class SlideChannel(models.Model):
                     'invoice_policy': 'order',
                     'is_published': True,
                 }
-                category = self.env.ref('product.product_category_all', raise_if_not_found=False)
                 if category:
                     product_vals['categ_id'] = category.id
-                
-                product = Product.create(product_vals)
+                product_vals_list.append(product_vals)
+
+            products = self.env['product.product'].create(product_vals_list)
+            for channel, product in zip(without_product, products):
                 channel.product_id = product.id
 
-            # Si ya tenemos producto (creado por academy o por nosotros), gestionamos las variantes
-            if channel.product_id:
-                channel._update_product_variants()
+        # Si ya tenemos producto (creado por academy o por nosotros), gestionamos las variantes
+        self._update_product_variants()
 
     def write(self, vals):
+        # Sincronizar solo si cambian de verdad los campos relevantes de blockchain
+        blockchain_fields = ['blockchain_certification_enabled', 'blockchain_certification_price']
+        if not any(f in vals for f in blockchain_fields):
+            return super().write(vals)
+
+        old_values = {channel.id: channel._get_blockchain_config() for channel in self}
         res = super().write(vals)
-        # Sincronizar si cambian campos relevantes de blockchain
-        if any(f in vals for f in ['blockchain_certification_enabled', 'blockchain_certification_price']):
-            self._sync_course_product()
+        changed = self.filtered(lambda c: c._get_blockchain_config() != old_values[c.id])
+        if changed:
+            changed._sync_course_product()
         return res
 
+    def _get_blockchain_config(self):
+        self.ensure_one()
+        return self.blockchain_certification_enabled, self.blockchain_certification_price
+
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
         # Sincronización automática al crear
-        for record in records:
-            if record.blockchain_certification_enabled:
-                record._sync_course_product()
+        to_sync = records.filtered('blockchain_certification_enabled')
+        if to_sync:
+            to_sync._sync_course_product()
         return records
 
-    def _action_add_members(self, target_partners):
+    def _action_add_members(self, target_partners, *args, **kwargs):
         """
         Override para gestionar derechos de blockchain en inscripciones gratuitas/automáticas.
         """
-        res = super(SlideChannel, self)._action_add_members(target_partners)
-        
         # Lógica para Cursos/Certificados Gratuitos
         # Si la certificación está habilitada y el precio extra es 0, todos los inscritos
         # reciben el derecho automáticamente (ej: cursos públicos o gratuitos).
-        for channel in self:
-            if channel.blockchain_certification_enabled and channel.blockchain_certification_price == 0:
-                # Buscar los enrollments recién creados/actualizados para estos partners
-                enrollments = self.env['slide.channel.partner'].sudo().search([
-                    ('channel_id', '=', channel.id),
-                    ('partner_id', 'in', target_partners.ids)
-                ])
-                enrollments.write({'blockchain_certification_rights': True})
-                
+        free_certification = self.filtered(
+            lambda c: c.blockchain_certification_enabled and c.blockchain_certification_price == 0
+        )
+        if not free_certification:
+            return super(SlideChannel, self)._action_add_members(target_partners, *args, **kwargs)
+
+        # Las inscripciones nuevas nacen ya con el derecho (valor por defecto en el create
+        # masivo del core), sin búsqueda + write posterior por canal.
+        res = super(SlideChannel, free_certification.with_context(
+            default_blockchain_certification_rights=True
+        ))._action_add_members(target_partners, *args, **kwargs)
+        other_channels = self - free_certification
+        if other_channels:
+            res |= super(SlideChannel, other_channels)._action_add_members(target_partners, *args, **kwargs)
+
+        # Inscripciones que ya existían: una sola escritura para todo el lote de canales
+        self.env['slide.channel.partner'].sudo().search([
+            ('channel_id', 'in', free_certification.ids),
+            ('partner_id', 'in', target_partners.ids),
+            ('blockchain_certification_rights', '=', False),
+        ]).write({'blockchain_certification_rights': True})
+
         return res
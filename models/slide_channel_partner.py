@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields
+from odoo import models, fields, api
 
 class SlideChannelPartner(models.Model):
     _inherit = 'slide.channel.partner'
@@ -9,3 +9,34 @@ class SlideChannelPartner(models.Model):
         default=False,
         help="Indica si este alumno tiene derecho a recibir un certificado blockchain en este curso."
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        enrollments = super().create(vals_list)
+        # Intentos previos a la inscripción: recalcular su inscripción (y su elegibilidad)
+        enrollments._recompute_blockchain_user_inputs([('blockchain_enrollment_id', '=', False)])
+        return enrollments
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Archivar la inscripción (el alumno deja el curso) la desvincula de sus intentos
+        # y les retira la elegibilidad; desarchivarla la vuelve a vincular
+        if 'active' in vals:
+            self._recompute_blockchain_user_inputs()
+        return res
+
+    def unlink(self):
+        user_inputs = self.env['survey.user_input'].sudo().search([('blockchain_enrollment_id', 'in', self.ids)])
+        res = super().unlink()
+        if user_inputs:
+            self.env.add_to_compute(user_inputs._fields['blockchain_enrollment_id'], user_inputs)
+        return res
+
+    def _recompute_blockchain_user_inputs(self, extra_domain=None):
+        """Recalcula la inscripción (y la elegibilidad) de los intentos de estos alumnos en estos cursos."""
+        user_inputs = self.env['survey.user_input'].sudo().search([
+            ('slide_id.channel_id', 'in', self.channel_id.ids),
+            ('partner_id', 'in', self.partner_id.ids),
+        ] + (extra_domain or []))
+        if user_inputs:
+            self.env.add_to_compute(user_inputs._fields['blockchain_enrollment_id'], user_inputs)
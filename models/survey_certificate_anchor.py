@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Lotes de anclaje Merkle: varios certificados se registran en blockchain
+con una única transacción que contiene la raíz del árbol.
+"""
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from datetime import timedelta
+import json
+import logging
+import threading
+
+from ..tools.ledger import register_on_ledger
+from ..tools.merkle import build_merkle_tree
+
+_logger = logging.getLogger(__name__)
+
+
+class SurveyCertificateAnchor(models.Model):
+    _name = 'survey.certificate.anchor'
+    _inherit = ['mail.thread', 'blockchain.certified.mixin', 'survey.certificate.confirmation.mixin']
+    _description = 'Lote de Anclaje de Certificados'
+    _order = 'id desc'
+
+    name = fields.Char(string='Referencia', required=True, readonly=True, copy=False)
+    merkle_root = fields.Char(string='Raíz Merkle', readonly=True, index=True, copy=False)
+    leaf_count = fields.Integer(string='Certificados', readonly=True)
+    state = fields.Selection([
+        ('sealed', 'Sellado'),
+        ('registered', 'Registrado'),
+    ], string='Estado', default='sealed', readonly=True, index=True)
+    user_input_ids = fields.One2many('survey.user_input', 'blockchain_anchor_id', string='Certificados', readonly=True)
+
+    def _compute_blockchain_hash(self):
+        """Hook del mixin: lo que se registra en cadena es la raíz del árbol."""
+        self.ensure_one()
+        if not self.merkle_root:
+            raise UserError(_("El lote de anclaje no tiene raíz Merkle."))
+        return self.merkle_root
+
+    @api.model
+    def _create_from_user_inputs(self, user_inputs):
+        """
+        Sella un lote: construye el árbol y guarda índice y prueba en cada certificado.
+        El lote se asigna con un solo write sobre todo el recordset; índice y prueba son
+        propios de cada hoja, sin campos que dependan de ellos, y el flush los agrupa en un UPDATE.
+        """
+        user_inputs = user_inputs.sorted('id')
+        root, proofs = build_merkle_tree(user_inputs.mapped('blockchain_certificate_hash'))
+        anchor = self.create({
+            'name': f"ANCHOR/{fields.Datetime.now():%Y%m%d%H%M%S}/{root[:8]}",
+            'merkle_root': root,
+            'leaf_count': len(user_inputs),
+        })
+        user_inputs.write({'blockchain_anchor_id': anchor.id})
+        for index, (user_input, proof) in enumerate(zip(user_inputs, proofs)):
+            user_input.write({
+                'blockchain_merkle_leaf_index': index,
+                'blockchain_merkle_proof': json.dumps(proof),
+            })
+        _logger.info("Lote Merkle %s sellado con %s certificados (raíz %s)", anchor.name, len(user_inputs), root)
+        return anchor
+
+    def _register_anchor(self):
+        """
+        Registra la raíz en blockchain y da por registrados los certificados del lote,
+        que heredan el estado de confirmación de la transacción del lote.
+        Los que ya recibieron su correo (re-anclaje de históricos) terminan directamente.
+        """
+        self.ensure_one()
+        register_on_ledger(self)
+        self.state = 'registered'
+        hashed = self.user_input_ids.filtered(lambda ui: ui.blockchain_certificate_state == 'hashed')
+        confirmation_vals = {
+            'blockchain_confirmation_state': self.blockchain_confirmation_state,
+            'blockchain_confirmed_date': self.blockchain_confirmed_date,
+        }
+        already_mailed = hashed.filtered('blockchain_certificate_mailed')
+        already_mailed.write(dict(confirmation_vals, blockchain_certificate_state='mailed'))
+        (hashed - already_mailed).write(dict(confirmation_vals, blockchain_certificate_state='registered'))
+
+    def _handle_reverted_registration(self):
+        """
+        La transacción del lote se ha revertido: el lote vuelve a 'sealed' para que el cron
+        de lotes registre de nuevo la misma raíz, y sus certificados vuelven a esperarlo.
+        """
+        for anchor in self:
+            reverted_tx = anchor.blockchain_tx_reference
+            anchor.user_input_ids.filtered(
+                lambda ui: ui.blockchain_certificate_state == 'registered'
+            ).write({
+                'blockchain_certificate_state': 'hashed',
+                'blockchain_confirmation_state': False,
+                'blockchain_confirmed_date': False,
+            })
+            anchor.write({
+                'state': 'sealed',
+                'blockchain_entry_id': False,
+                'blockchain_tx_reference': False,
+            })
+            anchor.message_post(
+                body=_("La transacción del lote %(tx)s se ha revertido: se volverá a registrar la raíz.", tx=reverted_tx),
+                subtype_xmlid='mail.mt_note',
+            )
+
+    @api.model
+    def _cron_anchor_certificate_batches(self):
+        """
+        Agrupa los certificados con hash pendientes de anclaje en lotes de N certificados,
+        o antes si el más antiguo lleva más de T segundos esperando, y registra solo la raíz.
+        """
+        UserInput = self.env['survey.user_input'].sudo()
+        if not UserInput._is_merkle_anchoring():
+            return
+
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = int(ICP.get_param('elearning_blockchain_certification.anchor_batch_size', 256))
+        window = int(ICP.get_param('elearning_blockchain_certification.anchor_batch_window', 600))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        # 1. Sellar lotes nuevos
+        anchors = self.sudo().search([('state', '=', 'sealed')])
+        domain = [
+            ('blockchain_certificate_state', '=', 'hashed'),
+            ('blockchain_anchor_id', '=', False),
+        ]
+        window_limit = fields.Datetime.now() - timedelta(seconds=window)
+        while True:
+            user_inputs = UserInput.search(domain, limit=batch_size, order='blockchain_certificate_hash_date, id')
+            if not user_inputs:
+                break
+            oldest = user_inputs[0].blockchain_certificate_hash_date or window_limit
+            if len(user_inputs) < batch_size and oldest > window_limit:
+                break
+            anchors |= self._create_from_user_inputs(user_inputs)
+            if auto_commit:
+                self.env.cr.commit()
+
+        # 2. Registrar raíces (también reintenta lotes sellados que fallaron antes)
+        registered = False
+        for anchor in anchors:
+            try:
+                with self.env.cr.savepoint():
+                    anchor._register_anchor()
+                registered = True
+            except Exception as e:
+                _logger.error("Error registrando lote Merkle %s: %s", anchor.name, e)
+            if auto_commit:
+                self.env.cr.commit()
+
+        # 3. Los certificados registrados continúan por el pipeline (envío del correo)
+        if registered:
+            UserInput._trigger_certificate_pipeline()
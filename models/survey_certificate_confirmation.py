@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Estado de confirmación en cadena de las transacciones de registro
+(certificados individuales y lotes Merkle).
+"""
+from odoo import models, fields
+from collections import defaultdict
+import logging
+
+from ..tools.confirmation import TX_REVERTED, get_confirmation_node
+
+_logger = logging.getLogger(__name__)
+
+
+class SurveyCertificateConfirmationMixin(models.AbstractModel):
+    _name = 'survey.certificate.confirmation.mixin'
+    _description = 'Confirmación en Cadena del Registro de Certificados'
+
+    blockchain_tx_reference = fields.Char(string='Transacción', readonly=True, copy=False, index='btree_not_null')
+    blockchain_confirmation_state = fields.Selection([
+        ('unconfirmed', 'Sin Confirmar'),
+        ('confirmed', 'Confirmada'),
+        ('failed', 'Revertida'),
+    ], string='Confirmación', readonly=True, copy=False, index=True,
+        help='Se confirma cuando la transacción de registro alcanza la profundidad configurada '
+             '(elearning_blockchain_certification.confirmation_depth).')
+    blockchain_confirmations = fields.Integer(string='Confirmaciones', readonly=True, copy=False)
+    blockchain_confirmed_date = fields.Datetime(string='Fecha de Confirmación', readonly=True, copy=False)
+
+    def _get_blockchain_tx_reference(self):
+        """
+        Hash de la transacción creada por el core para este registro, o False si el core
+        no lo expone (sin campo 'tx_hash' o aún vacío): el nombre de la entrada no es un hash
+        que se pueda consultar al nodo.
+        """
+        self.ensure_one()
+        entry = self.blockchain_entry_id
+        if not entry or 'tx_hash' not in entry._fields:
+            return False
+        return entry['tx_hash'] or False
+
+    def _get_blockchain_submission_vals(self, tx_reference):
+        """
+        Valores tras enviar la transacción. Sin seguimiento de confirmaciones, o sin hash de
+        transacción que consultar, se da por confirmada: de lo contrario el registro quedaría
+        sin confirmar (y sin correo) para siempre.
+        """
+        if get_confirmation_node(self.env) is None or not tx_reference:
+            if not tx_reference and get_confirmation_node(self.env) is not None:
+                _logger.warning("Registro en blockchain de %s sin hash de transacción: se da por confirmado "
+                                "sin seguimiento", self)
+            return {
+                'blockchain_tx_reference': tx_reference or False,
+                'blockchain_confirmation_state': 'confirmed',
+                'blockchain_confirmed_date': fields.Datetime.now(),
+            }
+        return {
+            'blockchain_tx_reference': tx_reference or False,
+            'blockchain_confirmation_state': 'unconfirmed',
+            'blockchain_confirmations': 0,
+            'blockchain_confirmed_date': False,
+        }
+
+    def _update_blockchain_confirmations(self, confirmations, depth):
+        """
+        Aplica {tx_reference: confirmaciones} con una escritura por número de confirmaciones.
+        Un registro se confirma siempre que alcance 'depth', aunque el número no haya cambiado
+        (p. ej. tras bajar confirmation_depth). Las transacciones revertidas pasan a 'failed'.
+        Devuelve (confirmados, revertidos).
+        """
+        ids_by_count = defaultdict(list)
+        reverted = self.browse()
+        for record in self:
+            count = confirmations.get(record.blockchain_tx_reference)
+            if count == TX_REVERTED:
+                reverted |= record
+            elif count is not None and (count != record.blockchain_confirmations or count >= depth):
+                ids_by_count[count].append(record.id)
+
+        confirmed = self.browse()
+        now = fields.Datetime.now()
+        for count, record_ids in ids_by_count.items():
+            records = self.browse(record_ids)
+            vals = {'blockchain_confirmations': count}
+            if count >= depth:
+                vals.update({'blockchain_confirmation_state': 'confirmed', 'blockchain_confirmed_date': now})
+                confirmed |= records
+            records.write(vals)
+        if reverted:
+            _logger.error("Transacciones de registro revertidas: %s", reverted.mapped('blockchain_tx_reference'))
+            reverted.write({'blockchain_confirmation_state': 'failed'})
+        return confirmed, reverted
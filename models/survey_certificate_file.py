@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén de PDFs de certificados inmutables direccionado por contenido (SHA-256).
+"""
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import UserError
+from collections import defaultdict
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import hashlib
+import logging
+import os
+
+from ..tools.cold_storage import ColdStorageError, get_cold_store, get_rehydration_cache
+from ..tools.metrics import span
+from ..tools.overlay import get_page_size
+
+_logger = logging.getLogger(__name__)
+
+# Lectura por bloques en la auditoría: memoria constante sea cual sea el tamaño del PDF
+AUDIT_CHUNK_SIZE = 1024 * 1024
+
+
+def _sha256_file(path):
+    """SHA-256 de un fichero del filestore leído por bloques (None si no existe)."""
+    if not path or not os.path.isfile(path):
+        return None
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(AUDIT_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class SurveyCertificateFile(models.Model):
+    """
+    Un registro por contenido distinto, indexado por su SHA-256.
+
+    El binario vive en un ir.attachment, cuyo filestore ya es direccionado por contenido
+    (ruta = checksum SHA-1) y deduplica ficheros idénticos; aquí guardamos el SHA-256 que
+    se registra en blockchain, de modo que buscar o verificar un certificado nunca obliga
+    a releer ni recalcular el PDF.
+
+    Los certificados reproducibles (motor de superposición con datos fijados) se pueden
+    desalojar del filestore pasados unos días: el PDF se regenera idéntico bajo demanda.
+    El resto se puede mover al almacenamiento en frío (``tools/cold_storage.py``), del que
+    se leen bajo demanda a través de una caché LRU.
+    """
+    _name = 'survey.certificate.file'
+    _description = 'Fichero de Certificado Inmutable'
+    _rec_name = 'sha256'
+
+    sha256 = fields.Char(string='SHA-256', required=True, readonly=True, index=True)
+    attachment_id = fields.Many2one('ir.attachment', string='Adjunto', readonly=True, ondelete='restrict')
+    file_size = fields.Integer(string='Tamaño (bytes)', readonly=True)
+    user_input_ids = fields.One2many('survey.user_input', 'blockchain_certificate_file_id', string='Participaciones', readonly=True)
+    integrity_state = fields.Selection([
+        ('unchecked', 'Sin Verificar'),
+        ('ok', 'Íntegro'),
+        ('tampered', 'Alterado'),
+        ('missing', 'No Encontrado'),
+    ], string='Integridad', default='unchecked', required=True, readonly=True, index=True)
+    integrity_check_date = fields.Datetime(string='Última Verificación', readonly=True)
+    storage_state = fields.Selection([
+        ('stored', 'Almacenado'),
+        ('evicted', 'Desalojado'),
+        ('archived', 'Archivado en Frío'),
+    ], string='Almacenamiento', default='stored', required=True, readonly=True, index=True)
+    archive_pointer = fields.Char(string='Puntero de Archivo', readonly=True, copy=False,
+                                  help='Ubicación del PDF comprimido en el almacenamiento en frío.')
+    attachment_name = fields.Char(string='Nombre del Adjunto', readonly=True, copy=False,
+                                  help='Nombre del adjunto original, guardado al archivarlo: la descarga y la '
+                                       'rehidratación lo conservan.')
+    stored_date = fields.Datetime(string='Almacenado el', default=fields.Datetime.now, readonly=True)
+    reproducibility = fields.Selection([
+        ('unchecked', 'Sin Comprobar'),
+        ('reproducible', 'Reproducible'),
+        ('not_reproducible', 'No Reproducible'),
+    ], string='Reproducibilidad', default='unchecked', required=True, readonly=True)
+
+    _sql_constraints = [
+        ('sha256_unique', 'unique(sha256)', 'Ya existe un certificado con el mismo contenido.'),
+    ]
+
+    @api.model
+    def _store_contents(self, contents):
+        """
+        Guarda los PDFs indicados y devuelve los ficheros en el mismo orden.
+
+        :param contents: lista de tuplas (pdf_bytes, valores del ir.attachment)
+        Los contenidos ya almacenados se reutilizan; el resto se crea con un único create
+        de adjuntos y otro de ficheros.
+        """
+        with span('hash', size=len(contents)):
+            hashes = [hashlib.sha256(pdf_content).hexdigest() for pdf_content, _vals in contents]
+        files_by_hash = {file.sha256: file for file in self.sudo().search([('sha256', 'in', hashes)])}
+
+        to_create = {}
+        for hash_hex, (pdf_content, attachment_vals) in zip(hashes, contents):
+            if hash_hex not in files_by_hash and hash_hex not in to_create:
+                to_create[hash_hex] = (pdf_content, attachment_vals)
+
+        if to_create:
+            with span('attachment_write', size=len(to_create)):
+                attachments = self.env['ir.attachment'].create([
+                    dict(attachment_vals, datas=base64.b64encode(pdf_content))
+                    for pdf_content, attachment_vals in to_create.values()
+                ])
+                new_files = self.sudo().create([
+                    {'sha256': hash_hex, 'attachment_id': attachment.id, 'file_size': len(pdf_content)}
+                    for (hash_hex, (pdf_content, _vals)), attachment in zip(to_create.items(), attachments)
+                ])
+            files_by_hash.update({file.sha256: file for file in new_files})
+
+        return [files_by_hash[hash_hex] for hash_hex in hashes]
+
+    @api.model
+    def _release_attachments(self, attachments):
+        """
+        Desvincula del almacén los adjuntos que se van a borrar.
+        Un contenido que aún usa alguien (participaciones con ese certificado o, para un fondo,
+        certificados que lo fijan) se copia a un adjunto de quien lo usa; el filestore deduplica
+        el binario. El resto de ficheros se borra: ya no hay nada que regenerar ni verificar.
+        """
+        certificate_files = self.search([('attachment_id', 'in', attachments.ids)])
+        if not certificate_files:
+            return
+        UserInput = self.env['survey.user_input'].sudo()
+        holders = {
+            user_input.blockchain_certificate_file_id: user_input
+            for user_input in UserInput.search([('blockchain_certificate_file_id', 'in', certificate_files.ids)])
+        }
+        orphans = self.browse()
+        for certificate_file in certificate_files:
+            attachment = certificate_file.attachment_id
+            holder = holders.get(certificate_file)
+            if not holder and attachment.res_model == 'survey.survey':
+                # Fondo de certificado: lo usan los certificados de otras encuestas que fijan su SHA-256
+                pinned = UserInput.search([
+                    ('blockchain_certificate_inputs', 'like', certificate_file.sha256),
+                    ('survey_id', '!=', attachment.res_id),
+                ], limit=1)
+                holder = pinned.survey_id
+            if holder:
+                certificate_file.attachment_id = attachment.copy({'res_model': holder._name, 'res_id': holder.id})
+                _logger.info("Adjunto del certificado %s trasladado a %s", certificate_file.sha256, holder)
+            else:
+                orphans |= certificate_file
+        orphans.unlink()
+
+    @api.model
+    @tools.ormcache('sha256')
+    def _get_overlay_background(self, sha256):
+        """Fondo PDF y tamaño de página, precargados una vez por contenido del fondo."""
+        background = self.sudo().search([('sha256', '=', sha256)], limit=1).attachment_id.raw
+        if not background:
+            raise UserError(_("No se encuentra el fondo de certificado %(hash)s.", hash=sha256))
+        return background, get_page_size(background)
+
+    # -------------------------------------------------------------------------
+    # REPRODUCIBILIDAD Y DESALOJO
+    # -------------------------------------------------------------------------
+
+    def _regenerate_contents(self):
+        """
+        Regenera el PDF desde los datos fijados en su participación y comprueba que coincide
+        byte a byte con el hash registrado. Devuelve los bytes, o None si no es reproducible.
+        """
+        self.ensure_one()
+        user_input = self.sudo().user_input_ids[:1]
+        if not user_input or not user_input._is_certificate_reproducible():
+            return None
+        pdf_content = user_input._render_certificate_pdfs()[user_input.id]
+        if hashlib.sha256(pdf_content).hexdigest() != self.sha256:
+            _logger.error("El certificado %s regenerado no coincide con su hash registrado", self.sha256)
+            return None
+        return pdf_content
+
+    def _rehydrate(self):
+        """
+        Vuelve a guardar en el filestore el PDF de un fichero desalojado (regenerado) o
+        archivado (leído del almacenamiento en frío), para los usos que necesitan un adjunto.
+        """
+        for file in self.sudo().filtered(lambda f: f.storage_state != 'stored'):
+            if file.storage_state == 'archived':
+                pdf_content = file._get_archived_contents()
+            else:
+                pdf_content = file._regenerate_contents()
+                if pdf_content is None:
+                    file.reproducibility = 'not_reproducible'
+                    raise UserError(_("No es posible regenerar el certificado %(hash)s: no coincide con su hash registrado.",
+                                      hash=file.sha256))
+            attachment_vals = file.user_input_ids[:1]._prepare_certificate_attachment_vals()
+            if file.attachment_name:
+                attachment_vals['name'] = file.attachment_name
+            attachment = self.env['ir.attachment'].create(dict(attachment_vals, datas=base64.b64encode(pdf_content)))
+            file.write({
+                'attachment_id': attachment.id,
+                'storage_state': 'stored',
+                'stored_date': fields.Datetime.now(),
+                'archive_pointer': False,
+            })
+            _logger.info("Certificado %s devuelto al filestore", file.sha256)
+
+    def _evict_reproducible(self):
+        """
+        Comprueba que cada PDF se regenera idéntico y, solo entonces, borra su adjunto.
+        Los no reproducibles (motor QWeb, fondo perdido...) se marcan y se conservan.
+        """
+        evicted = self.browse()
+        for file in self.sudo().filtered(lambda f: f.storage_state == 'stored'):
+            reproducible = file._regenerate_contents() is not None
+            file.reproducibility = 'reproducible' if reproducible else 'not_reproducible'
+            if reproducible:
+                attachment = file.attachment_id
+                file.write({'attachment_id': False, 'storage_state': 'evicted'})
+                attachment.unlink()
+                evicted |= file
+        return evicted
+
+    @api.model
+    def _cron_evict_reproducible_certificates(self, batch_size=None):
+        """Desaloja los certificados reproducibles almacenados hace más de 'certificate_eviction_days' días."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        days = int(ICP.get_param('elearning_blockchain_certification.certificate_eviction_days', 0))
+        if days <= 0:
+            return
+        if batch_size is None:
+            batch_size = int(ICP.get_param('elearning_blockchain_certification.audit_batch_size', 1000))
+
+        files = self.sudo().search([
+            ('storage_state', '=', 'stored'),
+            ('reproducibility', '!=', 'not_reproducible'),
+            ('user_input_ids', '!=', False),
+            ('stored_date', '<', fields.Datetime.now() - timedelta(days=days)),
+        ], order='stored_date, id', limit=batch_size)
+        evicted = files._evict_reproducible()
+        _logger.info("Desalojo de certificados: %s de %s desalojados del filestore", len(evicted), len(files))
+
+    # -------------------------------------------------------------------------
+    # ALMACENAMIENTO EN FRÍO
+    # -------------------------------------------------------------------------
+
+    def _get_archived_contents(self):
+        """
+        PDF de un fichero archivado, sin devolverlo al filestore: se lee del almacenamiento
+        en frío, se comprueba su SHA-256 y se guarda en la caché LRU del proceso.
+        """
+        self.ensure_one()
+        cache = get_rehydration_cache(self.env)
+        pdf_content = cache.get(self.sha256)
+        if pdf_content is not None:
+            return pdf_content
+        with span('cold_storage_read'):
+            try:
+                pdf_content = get_cold_store(self.env, self.archive_pointer).get(self.archive_pointer)
+            except ColdStorageError as e:
+                _logger.error("Certificado archivado %s ilegible: %s", self.sha256, e)
+                raise UserError(_("No es posible leer el certificado archivado %(hash)s.", hash=self.sha256))
+        if hashlib.sha256(pdf_content).hexdigest() != self.sha256:
+            _logger.error("El certificado archivado %s no coincide con su hash registrado", self.sha256)
+            raise UserError(_("El certificado archivado %(hash)s no coincide con su hash registrado.", hash=self.sha256))
+        cache.put(self.sha256, pdf_content)
+        return pdf_content
+
+    def _archive_to_cold_storage(self):
+        """
+        Mueve los PDFs almacenados al almacenamiento en frío en un solo paquete y borra sus
+        adjuntos. Solo se archivan los que siguen coincidiendo con su hash: un PDF alterado
+        se queda en el filestore para que la auditoría lo siga señalando.
+        """
+        files = self.sudo().filtered(lambda f: f.storage_state == 'stored' and f.attachment_id)
+        contents = []
+        for file in files:
+            pdf_content = file.attachment_id.raw
+            if pdf_content and hashlib.sha256(pdf_content).hexdigest() == file.sha256:
+                contents.append((file, pdf_content))
+            else:
+                _logger.warning("Certificado %s no archivado: su adjunto no coincide con el hash", file.sha256)
+        if not contents:
+            return self.browse()
+
+        with span('cold_storage_write', size=len(contents)):
+            pointers = get_cold_store(self.env).put_many([(file.sha256, pdf) for file, pdf in contents])
+        archived = self.browse()
+        for file, _pdf in contents:
+            attachment = file.attachment_id
+            file.write({
+                'attachment_id': False,
+                'attachment_name': attachment.name,
+                'storage_state': 'archived',
+                'archive_pointer': pointers[file.sha256],
+            })
+            attachment.unlink()
+            archived |= file
+        return archived
+
+    @api.model
+    def _cron_archive_certificates(self, batch_size=None):
+        """Archiva en frío los certificados almacenados hace más de 'cold_storage_days' días."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        days = int(ICP.get_param('elearning_blockchain_certification.cold_storage_days', 0))
+        if days <= 0:
+            return
+        if batch_size is None:
+            batch_size = int(ICP.get_param('elearning_blockchain_certification.cold_storage_batch_size', 500))
+
+        files = self.sudo().search([
+            ('storage_state', '=', 'stored'),
+            ('integrity_state', 'not in', ('tampered', 'missing')),
+            ('user_input_ids', '!=', False),
+            ('stored_date', '<', fields.Datetime.now() - timedelta(days=days)),
+        ], order='stored_date, id', limit=batch_size)
+        archived = files._archive_to_cold_storage()
+        _logger.info("Almacenamiento en frío: %s de %s certificados archivados", len(archived), len(files))
+
+    # -------------------------------------------------------------------------
+    # AUDITORÍA DE INTEGRIDAD
+    # -------------------------------------------------------------------------
+
+    def _audit_integrity(self, workers=4):
+        """
+        Recalcula el SHA-256 de cada PDF leyendo el filestore por bloques, con 'workers' hilos
+        (solo E/S y hashlib, sin ORM), y lo compara con el hash persistido.
+        Solo avisa (log de error y nota en el chatter) de los ficheros que acaban de pasar a
+        alterado o no encontrado: los ya detectados en auditorías anteriores no repiten la nota.
+        Devuelve {integrity_state: ficheros}.
+        """
+        Attachment = self.env['ir.attachment'].sudo()
+        files = self.sudo()
+        paths = [
+            Attachment._full_path(file.attachment_id.store_fname) if file.attachment_id.store_fname else None
+            for file in files
+        ]
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            hashes = list(executor.map(_sha256_file, paths))
+
+        results = defaultdict(lambda: self.browse())
+        for file, path, hash_hex in zip(files, paths, hashes):
+            if path is None and file.attachment_id.db_datas:
+                # Adjunto guardado en base de datos (ir_attachment.location = db)
+                hash_hex = hashlib.sha256(file.attachment_id.raw).hexdigest()
+            if hash_hex is None:
+                state = 'missing'
+            elif hash_hex != file.sha256:
+                state = 'tampered'
+            else:
+                state = 'ok'
+            results[state] |= file
+
+        previous_states = {file.id: file.integrity_state for file in files}
+        now = fields.Datetime.now()
+        for state, state_files in results.items():
+            state_files.write({'integrity_state': state, 'integrity_check_date': now})
+
+        compromised = (results['tampered'] | results['missing']).filtered(
+            lambda f: f.integrity_state != previous_states[f.id])
+        for file in compromised:
+            _logger.error("Auditoría de integridad: certificado %s %s (adjunto %s)",
+                          file.sha256, dict(self._fields['integrity_state'].selection)[file.integrity_state],
+                          file.attachment_id.id)
+            for user_input in file.user_input_ids:
+                user_input.message_post(
+                    body=_("La auditoría de integridad ha detectado que el PDF inmutable de este certificado "
+                           "no coincide con su hash registrado (%(hash)s).", hash=file.sha256),
+                    subtype_xmlid='mail.mt_note',
+                )
+        return results
+
+    @api.model
+    def _cron_audit_integrity(self, batch_size=None, workers=None):
+        """Audita los certificados verificados hace más tiempo (o nunca)."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        if batch_size is None:
+            batch_size = int(ICP.get_param('elearning_blockchain_certification.audit_batch_size', 1000))
+        if workers is None:
+            workers = int(ICP.get_param('elearning_blockchain_certification.audit_workers', 4))
+
+        files = self.sudo().search([('storage_state', '=', 'stored')],
+                                   order='integrity_check_date asc nulls first, id', limit=batch_size)
+        results = files._audit_integrity(workers=workers)
+        _logger.info("Auditoría de integridad: %s íntegros, %s alterados, %s no encontrados",
+                     len(results['ok']), len(results['tampered']), len(results['missing']))
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Extensión de survey.survey para elegir el motor de render de los certificados.
+"""
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
+import base64
+
+
+class SurveySurvey(models.Model):
+    _inherit = 'survey.survey'
+
+    certificate_render_engine = fields.Selection([
+        ('qweb', 'Informe QWeb (wkhtmltopdf)'),
+        ('overlay', 'Plantilla PDF superpuesta'),
+    ], string='Motor del Certificado', default='qweb', required=True,
+        help='Plantilla PDF superpuesta: estampa nombre, curso, puntuación, fecha y QR sobre un fondo PDF '
+             'en Python, sin lanzar wkhtmltopdf. Mucho más rápido en picos de emisión.')
+    certificate_overlay_background = fields.Binary(
+        string='Fondo del Certificado (PDF)', attachment=True,
+        help='PDF de una página sobre el que se estampan los campos del certificado.')
+
+    @api.constrains('certificate_render_engine', 'certificate_overlay_background')
+    def _check_certificate_overlay_background(self):
+        for survey in self:
+            if survey.certificate_render_engine == 'overlay' and not survey.certificate_overlay_background:
+                raise ValidationError(_("El motor de plantilla superpuesta necesita un fondo PDF."))
+
+    def _get_certificate_overlay_background_file(self):
+        """
+        Versión actual del fondo en el almacén de certificados (direccionado por SHA-256).
+        Los certificados fijan ese SHA-256: cambiar el fondo después no altera su regeneración.
+        """
+        self.ensure_one()
+        background = base64.b64decode(self.sudo().certificate_overlay_background)
+        return self.env['survey.certificate.file']._store_contents([(background, {
+            'name': f"Fondo Certificado - {self.title}.pdf",
+            'type': 'binary',
+            'res_model': self._name,
+            'res_id': self.id,
+            'mimetype': 'application/pdf',
+            'description': 'Fondo de Certificado',
+        })])[0]
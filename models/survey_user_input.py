@@ -1,95 +1,392 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.tools import format_date, mute_logger, split_every
+from datetime import timedelta
 import hashlib
 import logging
 import json
-import base64
+import psycopg2.errors
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from markupsafe import Markup
 
+from odoo.modules.registry import Registry
+
+from ..tools.confirmation import get_confirmation_depth, get_confirmation_node, poll_confirmations
+from ..tools.export import encode_id_ranges
+from ..tools.ledger import register_on_ledger
+from ..tools.merkle import verify_merkle_proof
+from ..tools.metrics import span
+from ..tools.overlay import DEFAULT_LAYOUT, OVERLAY_PRODUCER, stamp_certificate
+
 _logger = logging.getLogger(__name__)
 
+# Etapas del pipeline de emisión que todavía requieren trabajo del cron
+CERTIFICATE_PIPELINE_ACTIVE_STATES = ('pending', 'rendered', 'hashed', 'registered')
+# Reintentos con backoff exponencial: 1min, 2min, 4min... hasta 1h, máximo 8 intentos
+CERTIFICATE_RETRY_BASE_DELAY = 60
+CERTIFICATE_RETRY_MAX_DELAY = 3600
+CERTIFICATE_MAX_ATTEMPTS = 8
+
+
+def _register_certificate_in_new_cursor(dbname, uid, context, su, user_input_id):
+    """
+    Registro blockchain de un intento en una transacción propia (hilos del backfill).
+    'su' conserva el modo superusuario del llamante, como en el camino secuencial.
+    """
+    with Registry(dbname).cursor() as cr:
+        env = api.Environment(cr, uid, context, su=su)
+        try:
+            env['survey.user_input'].browse(user_input_id)._advance_certificate_pipeline()
+        except Exception as e:
+            cr.rollback()
+            _logger.warning("Backfill: error registrando el certificado %s: %s", user_input_id, e)
+            return str(e)
+    return None
+
+
 class SurveyUserInput(models.Model):
-    _inherit = ['survey.user_input', 'blockchain.certified.mixin']
+    _inherit = ['survey.user_input', 'blockchain.certified.mixin', 'survey.certificate.confirmation.mixin']
     _name = 'survey.user_input'
 
-    blockchain_certificate_hash = fields.Char(string='Hash del Certificado', readonly=True)
+    blockchain_certificate_hash = fields.Char(string='Hash del Certificado', readonly=True, index='btree_not_null')
+    blockchain_certificate_file_id = fields.Many2one(
+        'survey.certificate.file', string='Certificado Inmutable', readonly=True, copy=False,
+        index='btree_not_null', ondelete='restrict')
+
+    # -------------------------------------------------------------------------
+    # ELEGIBILIDAD (MEMOIZADA)
+    # -------------------------------------------------------------------------
+
+    blockchain_enrollment_id = fields.Many2one(
+        'slide.channel.partner', string='Inscripción en el Curso',
+        compute='_compute_blockchain_enrollment_id', store=True, index='btree_not_null')
+    blockchain_eligible = fields.Boolean(
+        string='Certificable en Blockchain',
+        compute='_compute_blockchain_eligible', store=True, index=True,
+        help='El slide es una certificación blockchain de un curso con la opción activa '
+             'y el alumno tiene derechos de certificación en su inscripción.')
+
+    # -------------------------------------------------------------------------
+    # PIPELINE ASÍNCRONO DE EMISIÓN
+    # -------------------------------------------------------------------------
+
+    blockchain_certificate_state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('rendered', 'PDF Generado'),
+        ('hashed', 'Hash Calculado'),
+        ('registered', 'Registrado en Blockchain'),
+        ('mailed', 'Enviado'),
+        ('failed', 'Fallido'),
+    ], string='Estado del Certificado', readonly=True, copy=False, index=True,
+        help='Etapa del pipeline de emisión del certificado blockchain. '
+             'El cron avanza cada intento desde "Pendiente" hasta "Enviado".')
+    blockchain_certificate_attempts = fields.Integer(string='Intentos de Emisión', readonly=True, copy=False)
+    blockchain_certificate_next_try = fields.Datetime(string='Próximo Reintento', readonly=True, copy=False)
+    blockchain_certificate_error = fields.Text(string='Último Error de Emisión', readonly=True, copy=False)
+    blockchain_certificate_mailed = fields.Boolean(
+        string='Correo de Certificación Enviado', readonly=True, copy=False,
+        help='El alumno ya recibió el correo de certificación: la etapa de correo del pipeline '
+             'no lo vuelve a enviar (por ejemplo, al re-anclar certificados históricos).')
+    blockchain_certificate_hash_date = fields.Datetime(string='Fecha del Hash', readonly=True, copy=False)
+    blockchain_issuance_key = fields.Char(
+        string='Clave de Idempotencia', readonly=True, copy=False,
+        help='Identifica el registro en cadena de este certificado (base de datos, participación y hash). '
+             'Un reintento con la misma clave no vuelve a registrar el certificado.')
+
+    _sql_constraints = [
+        ('blockchain_issuance_key_unique', 'unique(blockchain_issuance_key)',
+         'Ya existe un registro en blockchain con la misma clave de idempotencia.'),
+    ]
+
+    # -------------------------------------------------------------------------
+    # ANCLAJE POR LOTES (ÁRBOL MERKLE)
+    # -------------------------------------------------------------------------
+
+    blockchain_anchor_id = fields.Many2one(
+        'survey.certificate.anchor', string='Lote de Anclaje', readonly=True, copy=False, index='btree_not_null',
+        help='Lote Merkle cuya raíz se registró en blockchain incluyendo este certificado.')
+    blockchain_merkle_leaf_index = fields.Integer(string='Índice de Hoja Merkle', readonly=True, copy=False)
+    blockchain_merkle_proof = fields.Text(
+        string='Prueba de Inclusión Merkle', readonly=True, copy=False,
+        help='JSON con los pares [lado, hash hermano] desde la hoja hasta la raíz del lote.')
+
+    blockchain_certificate_inputs = fields.Text(
+        string='Datos de Emisión', readonly=True, copy=False,
+        help='JSON con el motor y todos los datos usados para renderizar el certificado, fijados al emitirlo: '
+             'con el motor de superposición el PDF se puede regenerar byte a byte.')
 
     def _get_immutable_certificate_attachment(self):
-        """Busca si existe un adjunto inmutable para este registro."""
-        return self.env['ir.attachment'].sudo().search([
-            ('res_model', '=', 'survey.user_input'),
-            ('res_id', '=', self.id),
-            ('description', '=', 'Certificado Blockchain Inmutable')
-        ], limit=1)
+        """
+        Adjunto del PDF inmutable de este registro (lectura por clave primaria, sin búsqueda).
+        Si el PDF se desalojó o se archivó en frío vuelve antes al filestore.
+        """
+        certificate_file = self.sudo().blockchain_certificate_file_id
+        if certificate_file and certificate_file.storage_state != 'stored':
+            certificate_file._rehydrate()
+        return certificate_file.attachment_id
 
-    def _generate_and_store_certificate(self):
+    def _get_immutable_certificate_attachments(self):
+        """Adjuntos inmutables de todo el recordset indexados por id de participación."""
+        certificate_files = self.sudo().blockchain_certificate_file_id
+        certificate_files.filtered(lambda f: f.storage_state != 'stored')._rehydrate()
+        return {
+            user_input.id: user_input.blockchain_certificate_file_id.attachment_id
+            for user_input in self.sudo()
+            if user_input.blockchain_certificate_file_id
+        }
+
+    def _render_certificate_pdfs(self):
         """
-        Genera el PDF, lo guarda como adjunto inmutable y calcula su hash.
-        Debe llamarse síncronamente antes del registro blockchain.
+        Renderiza los certificados del recordset con el motor fijado en cada uno al emitirlo
+        (ver survey.survey.certificate_render_engine). Devuelve {user_input_id: pdf_bytes}.
+        """
+        self._pin_certificate_inputs()
+        overlay_inputs = self.filtered(lambda ui: ui._get_certificate_inputs()['engine'] == 'overlay')
+        pdfs = (self - overlay_inputs)._render_certificate_pdfs_qweb() if self - overlay_inputs else {}
+        if overlay_inputs:
+            pdfs.update(overlay_inputs._render_certificate_pdfs_overlay())
+        return pdfs
+
+    def _get_certificate_inputs(self):
+        self.ensure_one()
+        return json.loads(self.blockchain_certificate_inputs or '{}')
+
+    def _pin_certificate_inputs(self):
         """
+        Fija en cada registro sin datos de emisión el motor, la fecha de emisión y, con el motor
+        de superposición, los textos, el layout, los metadatos PDF y el SHA-256 del fondo
+        (guardado en el almacén de certificados): el render deja de depender de la fecha
+        actual, del idioma o de cambios posteriores en la encuesta.
+        """
+        to_pin = self.filtered(lambda ui: not ui.blockchain_certificate_inputs)
+        for survey, user_inputs in to_pin.grouped('survey_id').items():
+            background_sha256 = False
+            if survey.certificate_render_engine == 'overlay':
+                background_sha256 = survey._get_certificate_overlay_background_file().sha256
+            for user_input in user_inputs:
+                issued_on = user_input.end_datetime or fields.Datetime.now()
+                inputs = {'engine': survey.certificate_render_engine, 'issued_on': fields.Datetime.to_string(issued_on)}
+                if background_sha256:
+                    inputs.update({
+                        'background_sha256': background_sha256,
+                        'layout': DEFAULT_LAYOUT,
+                        'values': user_input._get_certificate_overlay_values(issued_on),
+                        'metadata': {
+                            '/Title': survey.title or '',
+                            '/Producer': OVERLAY_PRODUCER,
+                            '/CreationDate': issued_on.strftime("D:%Y%m%d%H%M%S+00'00'"),
+                        },
+                    })
+                user_input.blockchain_certificate_inputs = json.dumps(inputs, sort_keys=True, ensure_ascii=False)
+
+    def _render_certificate_pdfs_overlay(self):
+        """
+        Estampa los textos fijados sobre el fondo PDF (precargado una vez por versión).
+        Sin wkhtmltopdf: Python puro, unos milisegundos por certificado, y reproducible
+        byte a byte a partir de blockchain_certificate_inputs.
+        """
+        CertificateFile = self.env['survey.certificate.file']
+        pdfs = {}
+        with span('pdf_render_overlay', size=len(self)):
+            for user_input in self:
+                inputs = user_input._get_certificate_inputs()
+                background, page_size = CertificateFile._get_overlay_background(inputs['background_sha256'])
+                pdfs[user_input.id] = stamp_certificate(
+                    background, inputs['values'], page_size=page_size,
+                    layout=inputs['layout'], metadata=inputs['metadata'])
+        return pdfs
+
+    def _get_certificate_overlay_values(self, issued_on):
+        """Textos que el motor de superposición estampa en el certificado."""
+        self.ensure_one()
+        verify_url = f"{self.get_base_url()}/certificate/verify"
+        return {
+            'partner': self.partner_id.name or self.email or '',
+            'survey': self.survey_id.title or '',
+            'score': _("Puntuación: %(score)s%%", score=round(self.scoring_percentage, 2)),
+            'date': format_date(self.env, issued_on, lang_code=self.partner_id.lang),
+            'reference': _("Verifique este certificado en %(url)s", url=verify_url),
+            'qr': verify_url,
+        }
+
+    def _is_certificate_reproducible(self):
+        """El PDF se puede regenerar idéntico: motor de superposición con datos fijados."""
         self.ensure_one()
-        
+        return self._get_certificate_inputs().get('engine') == 'overlay'
+
+    def _render_certificate_pdfs_qweb(self):
+        """
+        Renderiza los certificados del recordset con una única invocación de wkhtmltopdf.
+        Devuelve {user_input_id: pdf_bytes}.
+
+        Usamos _render_qweb_pdf_prepare_streams, que separa el PDF por registro (outlines)
+        y, a diferencia de _render_qweb_pdf, no guarda el adjunto 'certification.pdf'.
+        """
+        with span('pdf_render', size=len(self)):
+            streams = self.env['ir.actions.report'].sudo()._render_qweb_pdf_prepare_streams(
+                'survey.certification_report',
+                {'report_type': 'pdf'},
+                res_ids=self.ids,
+            )
+        pdfs = {}
+        try:
+            for user_input in self:
+                stream = (streams.get(user_input.id) or {}).get('stream')
+                if stream:
+                    pdfs[user_input.id] = stream.getvalue()
+                elif len(self) > 1:
+                    # wkhtmltopdf no permitió separar el PDF por registro: render individual
+                    pdfs.update(user_input._render_certificate_pdfs_qweb())
+                else:
+                    raise UserError(_("No se pudo generar el PDF del certificado %s.", user_input.id))
+        finally:
+            for stream_data in streams.values():
+                if stream_data.get('stream'):
+                    stream_data['stream'].close()
+        return pdfs
+
+    def _prepare_certificate_attachment_vals(self):
+        self.ensure_one()
+        # Fecha de emisión fijada, no la de hoy: regenerar el adjunto produce el mismo nombre
+        start_date = fields.Datetime.from_string(self._get_certificate_inputs().get('issued_on')
+                                                 or fields.Datetime.now()).date()
+        attachment_name = f"Certificado_{self.survey_id.title}_{self.partner_id.name}_{start_date}.pdf".replace('/', '_').replace(' ', '_')
+        return {
+            'name': attachment_name,
+            'type': 'binary',
+            'res_model': 'survey.user_input',
+            'res_id': self.id,
+            'mimetype': 'application/pdf',
+            'description': 'Certificado Blockchain Inmutable'
+        }
+
+    def _render_and_store_certificate(self):
+        """
+        Genera el PDF y lo guarda en el almacén de certificados inmutables (etapa 'rendered').
+        Si el certificado ya existe se reutiliza para no generar una segunda versión.
+        """
+        self.ensure_one()
+
         # 1. Verificar si ya existe para evitar duplicados
-        existing = self._get_immutable_certificate_attachment()
-        if existing:
-            _logger.info("Certificado inmutable ya existe (ID: %s). Recalculando hash...", existing.id)
-            pdf_content = base64.b64decode(existing.datas)
-            hash_hex = hashlib.sha256(pdf_content).hexdigest()
-            if self.blockchain_certificate_hash != hash_hex:
-                 self.write({'blockchain_certificate_hash': hash_hex})
-            return hash_hex
+        if self.blockchain_certificate_file_id:
+            _logger.info("Certificado inmutable ya existe (ID: %s).", self.blockchain_certificate_file_id.id)
+            return self._get_immutable_certificate_attachment()
 
         # 2. Generar Reporte PDF
         try:
-            # Usar llamada directa al motor de reportes con el XML ID correcto
-            # 'survey.certification_report' es el ID estándar usado por el controlador original
-            pdf_content, _ = self.env['ir.actions.report'].sudo()._render_qweb_pdf(
-                'survey.certification_report', 
-                [self.id], 
-                data={'report_type': 'pdf'}
-            )
-            
-            # --- CLEANUP SIDE EFFECT ---
-            # El reporte 'survey.certification_report' tiene configurado attachment='certification.pdf'.
-            # Al llamar a _render_qweb_pdf, Odoo crea automáticamente ese adjunto.
-            # Debemos eliminarlo para evitar duplicados "basura" en el chatter.
-            side_effect_attachment = self.env['ir.attachment'].sudo().search([
-                ('res_model', '=', 'survey.user_input'),
-                ('res_id', '=', self.id),
-                ('name', '=', 'certification.pdf')
-            ])
-            if side_effect_attachment:
-                _logger.info("Eliminando adjunto duplicado automático: %s", side_effect_attachment.name)
-                side_effect_attachment.unlink()
-            # ---------------------------
-            
-            # 3. Guardar como adjunto permanente
-            start_date = fields.Date.today()
-            attachment_name = f"Certificado_{self.survey_id.title}_{self.partner_id.name}_{start_date}.pdf".replace('/', '_').replace(' ', '_')
-            
-            attachment = self.env['ir.attachment'].create({
-                'name': attachment_name,
-                'type': 'binary',
-                'datas': base64.b64encode(pdf_content),
-                'res_model': 'survey.user_input',
-                'res_id': self.id,
-                'mimetype': 'application/pdf',
-                'description': 'Certificado Blockchain Inmutable'
-            })
-            
-            # 4. Calcular y guardar Hash
-            hash_hex = hashlib.sha256(pdf_content).hexdigest()
-            self.write({'blockchain_certificate_hash': hash_hex})
-            
-            _logger.info("PDF inmutable generado y guardado (Adjunto ID: %s, Hash: %s)", attachment.id, hash_hex)
-            return hash_hex
+            pdf_content = self._render_certificate_pdfs()[self.id]
+
+            # 3. Guardar en el almacén (direccionado por SHA-256)
+            certificate_file = self.env['survey.certificate.file']._store_contents(
+                [(pdf_content, self._prepare_certificate_attachment_vals())]
+            )[0]
+            self.blockchain_certificate_file_id = certificate_file
+
+            _logger.info("PDF inmutable generado y guardado (Fichero ID: %s, Hash: %s)",
+                         certificate_file.id, certificate_file.sha256)
+            return certificate_file.attachment_id
             
         except Exception as e:
             _logger.error("Error FATAL generando certificado inmutable: %s", e, exc_info=True)
             # No devolver fallback aquí si es una generación explícita, mejor fallar para notificar error
-            # Si esto falla, el _mark_done atrapará el error y no registrará en blockchain
+            # Si esto falla, el pipeline reintentará y no registrará en blockchain
             raise e
 
+    def _render_and_store_certificates(self, chunk_size=None):
+        """
+        Versión por lotes de _generate_and_store_certificate para cohortes completas
+        (pipeline y regeneraciones masivas): renderiza por bloques de 'chunk_size' registros
+        con una llamada al motor de reportes por bloque, guarda todos los PDFs del bloque
+        en el almacén con un solo create y copia su hash sin volver a leerlos del filestore.
+        """
+        if chunk_size is None:
+            chunk_size = int(self.env['ir.config_parameter'].sudo().get_param(
+                'elearning_blockchain_certification.render_chunk_size', 50))
+
+        CertificateFile = self.env['survey.certificate.file']
+        to_render = self.filtered(lambda ui: not ui.blockchain_certificate_file_id)
+        for chunk_ids in split_every(chunk_size, to_render.ids):
+            chunk = self.browse(chunk_ids)
+            pdfs = chunk._render_certificate_pdfs()
+            certificate_files = CertificateFile._store_contents([
+                (pdfs[user_input.id], user_input._prepare_certificate_attachment_vals())
+                for user_input in chunk
+            ])
+            for user_input, certificate_file in zip(chunk, certificate_files):
+                user_input.blockchain_certificate_file_id = certificate_file
+            _logger.info("Bloque de %s certificados inmutables generado y guardado", len(chunk))
+
+        for user_input in self:
+            user_input._store_certificate_hash()
+        return self._get_immutable_certificate_attachments()
+
+    def _store_certificate_hash(self):
+        """
+        Copia en el registro el SHA-256 del PDF inmutable (etapa 'hashed').
+        El hash se calculó una sola vez al guardar el fichero: aquí no se relee el PDF.
+        """
+        self.ensure_one()
+        certificate_file = self.blockchain_certificate_file_id
+        if not certificate_file:
+            raise UserError(_("No se ha generado el certificado PDF. No es posible calcular su hash."))
+
+        if self.blockchain_certificate_hash != certificate_file.sha256:
+            self.write({
+                'blockchain_certificate_hash': certificate_file.sha256,
+                'blockchain_certificate_hash_date': fields.Datetime.now(),
+                'blockchain_issuance_key': self._get_certificate_issuance_key(certificate_file.sha256),
+            })
+        return certificate_file.sha256
+
+    def _get_certificate_issuance_key(self, hash_hex, revision=None):
+        """
+        Clave de idempotencia del registro en cadena: estable para la misma participación y PDF.
+        'revision' (la transacción revertida que se sustituye) permite un registro nuevo.
+        """
+        self.ensure_one()
+        database_uuid = self.env['ir.config_parameter'].sudo().get_param('database.uuid')
+        key = f"{database_uuid}:survey.user_input:{self.id}:{hash_hex}"
+        if revision:
+            key += f":{revision}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _lock_certificate_issuance(self):
+        """
+        Bloquea las filas del recordset hasta el fin de la transacción (FOR UPDATE SKIP LOCKED) y
+        devuelve las que se han podido bloquear, releídas de la base de datos. Las que tiene otro
+        worker, o que otro worker ha modificado después de nuestra instantánea, se omiten:
+        así varios workers pueden drenar la emisión en paralelo sin renders ni registros duplicados.
+        """
+        if not self:
+            return self
+        self.flush_recordset()
+        try:
+            with self.env.cr.savepoint(), mute_logger('odoo.sql_db'):
+                self.env.cr.execute(
+                    "SELECT id FROM survey_user_input WHERE id IN %s FOR UPDATE SKIP LOCKED",
+                    [tuple(self.ids)],
+                )
+                locked_ids = {row[0] for row in self.env.cr.fetchall()}
+        except psycopg2.errors.SerializationFailure:
+            return self.browse()
+        locked = self.browse([user_input_id for user_input_id in self.ids if user_input_id in locked_ids])
+        locked.invalidate_recordset()
+        return locked
+
+    def _generate_and_store_certificate(self):
+        """
+        Genera el PDF, lo guarda como adjunto inmutable y calcula su hash.
+        Atajo síncrono de las etapas 'rendered' y 'hashed' del pipeline.
+        """
+        self.ensure_one()
+        if not self._lock_certificate_issuance():
+            raise UserError(_("El certificado se está emitiendo en otro proceso. Inténtelo de nuevo en unos instantes."))
+        self._render_and_store_certificate()
+        return self._store_certificate_hash()
+
     def _compute_blockchain_hash(self):
         """
         Método llamado por el mixin de blockchain.
@@ -113,143 +410,720 @@ class SurveyUserInput(models.Model):
         raise UserError(_("No se ha generado el certificado PDF. No es posible registrar en Blockchain sin el documento inmutable."))
 
 
-    def _should_certify_on_blockchain(self):
+    @api.depends('slide_id.channel_id', 'partner_id')
+    def _compute_blockchain_enrollment_id(self):
+        """Inscripción del alumno en el curso del slide (una búsqueda para todo el lote)."""
+        candidates = self.filtered(lambda ui: ui.slide_id.channel_id and ui.partner_id)
+        enrollments = self.env['slide.channel.partner'].sudo().search([
+            ('channel_id', 'in', candidates.slide_id.channel_id.ids),
+            ('partner_id', 'in', candidates.partner_id.ids),
+        ]) if candidates else self.env['slide.channel.partner']
+        enrollment_by_key = {
+            (enrollment.channel_id.id, enrollment.partner_id.id): enrollment
+            for enrollment in enrollments
+        }
+        for user_input in self:
+            user_input.blockchain_enrollment_id = enrollment_by_key.get(
+                (user_input.slide_id.channel_id.id, user_input.partner_id.id), False)
+
+    @api.depends(
+        'slide_id.slide_category',
+        'slide_id.blockchain_certifiable',
+        'slide_id.channel_id.blockchain_certification_enabled',
+        'blockchain_enrollment_id.blockchain_certification_rights',
+    )
+    def _compute_blockchain_eligible(self):
         """
-        Determina si este intento debe ser registrado en blockchain.
         Validación estricta basada en el slide de origen y los derechos de inscripción.
+        Campo almacenado: los lotes y las vistas leen una columna en lugar de repetir búsquedas.
         """
+        for user_input in self:
+            slide = user_input.slide_id
+            user_input.blockchain_eligible = bool(
+                slide
+                and slide.slide_category == 'certification'
+                and slide.blockchain_certifiable
+                and slide.channel_id.blockchain_certification_enabled
+                and user_input.blockchain_enrollment_id.blockchain_certification_rights
+            )
+
+    def _filter_blockchain_certifiable(self):
+        """Subconjunto del recordset que debe registrarse en blockchain."""
+        return self.filtered('blockchain_eligible')
+
+    def _should_certify_on_blockchain(self):
+        """Determina si este intento debe ser registrado en blockchain."""
         self.ensure_one()
-        
-        # 1. Validación de Contexto: Debe venir de un Slide específico
-        if not self.slide_id:
+        return self.blockchain_eligible
+
+    # -------------------------------------------------------------------------
+    # ETAPAS DEL PIPELINE
+    # -------------------------------------------------------------------------
+
+    def _certificate_stage_render(self):
+        self._render_and_store_certificate()
+        self.blockchain_certificate_state = 'rendered'
+
+    def _certificate_stage_hash(self):
+        self._store_certificate_hash()
+        self.blockchain_certificate_state = 'hashed'
+
+    def _certificate_stage_register(self):
+        """
+        Registra el hash en cadena salvo que ya lo esté: una caída entre la llamada al core
+        y el commit, un registro manual desde el botón del mixin o un reintento no deben
+        crear una segunda transacción. En ese caso solo avanza el estado.
+        """
+        anchor = self.blockchain_anchor_id
+        if anchor:
+            # Incluido en un lote Merkle: lo registra el cron de lotes
+            if anchor.state != 'registered':
+                return False
+            self.write({
+                'blockchain_certificate_state': 'registered',
+                'blockchain_confirmation_state': anchor.blockchain_confirmation_state,
+                'blockchain_confirmed_date': anchor.blockchain_confirmed_date,
+            })
+            return
+        # En modo Merkle el registro lo hace el cron de lotes (survey.certificate.anchor)
+        if self._is_merkle_anchoring():
             return False
-            
-        # 2. Validación del Slide: Debe ser certificable
-        if self.slide_id.slide_category != 'certification' or not self.slide_id.blockchain_certifiable:
+        if self.blockchain_entry_id or self.blockchain_tx_reference:
+            _logger.info("Certificado %s ya registrado en cadena: no se vuelve a registrar", self.id)
+            if not self.blockchain_confirmation_state:
+                self.write(self._get_blockchain_submission_vals(self._get_blockchain_tx_reference()))
+        else:
+            register_on_ledger(self, idempotency_key=self.blockchain_issuance_key)
+        self.blockchain_certificate_state = 'registered'
+
+    def action_blockchain_register(self):
+        """Los certificados anclados en un lote Merkle ya están en cadena a través de su raíz."""
+        if self.filtered('blockchain_anchor_id'):
+            raise UserError(_("Este certificado ya está registrado en blockchain mediante su lote Merkle."))
+        return super().action_blockchain_register()
+
+    def _certificate_stage_mail(self):
+        """
+        Envía el correo de certificación (retenido en _mark_done) con el PDF inmutable adjunto
+        desde la composición: el informe dinámico no se renderiza y no hay adjuntos que sustituir.
+        Con alumno, el correo es un único mensaje del chatter que se le notifica por email;
+        las participaciones solo con email lo reciben por la plantilla.
+        Acepta un recordset: cada campo de la plantilla se renderiza una vez para todo el lote.
+        """
+        to_mail = self.filtered(lambda ui: ui.survey_id.certification_mail_template_id and not ui.test_entry
+                                and not ui.blockchain_certificate_mailed)
+        immutable_attachments = to_mail._get_immutable_certificate_attachments()
+        for template, user_inputs in to_mail.grouped(lambda ui: ui.survey_id.certification_mail_template_id).items():
+            with_partner = user_inputs.filtered('partner_id')
+            if with_partner:
+                with span('mail', size=len(with_partner)):
+                    # post_process: enlaces e imágenes relativos de la plantilla pasan a absolutos, como en send_mail
+                    rendered = {
+                        field: template._render_field(field, with_partner.ids, compute_lang=True,
+                                                      post_process=field == 'body_html')
+                        for field in ('subject', 'body_html', 'email_from')
+                    }
+                for user_input in with_partner:
+                    attachment = immutable_attachments.get(user_input.id)
+                    with span('chatter_post'):
+                        # Correo siempre, también para alumnos internos con notificaciones en la bandeja de Odoo
+                        user_input.with_context(
+                            blockchain_certificate_force_email=user_input.partner_id.ids,
+                        ).message_post(
+                            body=rendered['body_html'][user_input.id],
+                            subject=rendered['subject'][user_input.id],
+                            email_from=rendered['email_from'][user_input.id] or None,
+                            partner_ids=user_input.partner_id.ids,
+                            attachment_ids=attachment.ids if attachment else [],
+                            email_layout_xmlid='mail.mail_notification_light',
+                            subtype_xmlid='mail.mt_comment',
+                            message_type='comment',
+                        )
+
+            without_partner = user_inputs - with_partner
+            certificate_attachments = {
+                user_input.id: immutable_attachments[user_input.id].id
+                for user_input in without_partner if user_input.id in immutable_attachments
+            }
+            for user_input in without_partner:
+                with span('mail'):
+                    template.with_context(blockchain_certificate_attachments=certificate_attachments).send_mail(
+                        user_input.id, email_layout_xmlid="mail.mail_notification_light")
+
+        self.write({'blockchain_certificate_state': 'mailed', 'blockchain_certificate_mailed': True})
+
+    def _notify_get_recipients(self, message, msg_vals=False, **kwargs):
+        """El correo de certificación se envía por email aunque el alumno prefiera la bandeja de Odoo."""
+        recipients = super()._notify_get_recipients(message, msg_vals=msg_vals, **kwargs)
+        force_email_ids = self.env.context.get('blockchain_certificate_force_email')
+        if force_email_ids:
+            for recipient in recipients:
+                if recipient['id'] in force_email_ids:
+                    recipient['notif'] = 'email'
+        return recipients
+
+    def _advance_certificate_pipeline(self):
+        """
+        Ejecuta la siguiente etapa pendiente del pipeline con la fila bloqueada.
+        Devuelve False si el registro no puede avanzar más en esta pasada
+        (también si otro worker lo está procesando).
+        """
+        self.ensure_one()
+        if not self._lock_certificate_issuance():
             return False
-            
-        # 3. Validación del Canal: Debe tener la feature activa
-        channel = self.slide_id.channel_id
-        if not channel.blockchain_certification_enabled:
+        # El correo solo sale cuando la transacción de registro está confirmada
+        if self.blockchain_certificate_state == 'registered' and self.blockchain_confirmation_state != 'confirmed':
             return False
-            
-        # 4. Validación de Derechos de Inscripción (Enrollment)
-        # Buscamos la inscripción específica del usuario en este curso.
-        # Esto desacopla la lógica de ventas y soporta cursos gratuitos o becados.
-        enrollment = self.env['slide.channel.partner'].sudo().search([
-            ('channel_id', '=', channel.id),
-            ('partner_id', '=', self.partner_id.id)
-        ], limit=1)
-        
-        if not enrollment:
+        stages = {
+            'pending': self._certificate_stage_render,
+            'rendered': self._certificate_stage_hash,
+            'hashed': self._certificate_stage_register,
+            'registered': self._certificate_stage_mail,
+        }
+        stage = stages.get(self.blockchain_certificate_state)
+        if not stage:
             return False
-            
-        # 5. Check Final: ¿Tiene derechos explícitos para este curso?
-        if enrollment.blockchain_certification_rights:
-            _logger.info("Blockchain Certification Approved for %s in Course %s", self.partner_id.name, channel.name)
-            return True
+        return stage() is not False
+
+    def _schedule_certificate_retry(self, error):
+        """Registra el fallo y programa el siguiente intento con backoff exponencial."""
+        self.ensure_one()
+        attempts = self.blockchain_certificate_attempts + 1
+        vals = {
+            'blockchain_certificate_attempts': attempts,
+            'blockchain_certificate_error': str(error),
+        }
+        if attempts >= CERTIFICATE_MAX_ATTEMPTS:
+            _logger.error("Emisión de certificado abandonada tras %s intentos (ID: %s): %s", attempts, self.id, error)
+            vals.update({'blockchain_certificate_state': 'failed', 'blockchain_certificate_next_try': False})
         else:
-            _logger.info("Blockchain Certification Denied for %s in Course %s (No Rights)", self.partner_id.name, channel.name)
+            delay = min(CERTIFICATE_RETRY_BASE_DELAY * 2 ** (attempts - 1), CERTIFICATE_RETRY_MAX_DELAY)
+            _logger.warning("Error en etapa '%s' del certificado %s, reintento en %ss: %s",
+                            self.blockchain_certificate_state, self.id, delay, error)
+            vals['blockchain_certificate_next_try'] = fields.Datetime.now() + timedelta(seconds=delay)
+        self.write(vals)
+
+    @api.model
+    def _is_merkle_anchoring(self):
+        """Modo de anclaje: 'single' (una transacción por certificado) o 'merkle' (lotes)."""
+        mode = self.env['ir.config_parameter'].sudo().get_param(
+            'elearning_blockchain_certification.anchoring_mode', 'single')
+        return mode == 'merkle'
+
+    def _verify_merkle_inclusion(self):
+        """Comprueba la prueba de inclusión del certificado frente a la raíz de su lote."""
+        self.ensure_one()
+        if not (self.blockchain_anchor_id.merkle_root and self.blockchain_merkle_proof):
             return False
+        return verify_merkle_proof(
+            self.blockchain_certificate_hash,
+            json.loads(self.blockchain_merkle_proof),
+            self.blockchain_anchor_id.merkle_root,
+        )
 
-    def _mark_done(self):
+    @api.model
+    def _get_certificate_verification(self, hash_hex, with_holder=False):
+        """
+        Resuelve un hash SHA-256 (hex) contra los certificados emitidos usando el índice
+        de blockchain_certificate_hash. Devuelve un dict serializable para la verificación pública.
+        Los hashes son públicos en cadena: solo con ``with_holder`` (quien presenta el PDF)
+        se incluyen el titular, la certificación y el estado del certificado.
+        """
+        user_input = self.sudo().search([('blockchain_certificate_hash', '=', hash_hex)], limit=1)
+        if not user_input:
+            return {'valid': False, 'hash': hash_hex}
+
+        anchor = user_input.blockchain_anchor_id
+        anchor_record = anchor or user_input
+        result = {
+            'valid': True,
+            'hash': hash_hex,
+            'certificate': {
+                'issued_on': fields.Datetime.to_string(user_input.end_datetime) if user_input.end_datetime else None,
+            },
+            'anchor': {
+                'mode': 'merkle' if anchor else 'single',
+                'status': anchor_record.blockchain_status or None,
+                'tx_reference': anchor_record.blockchain_tx_reference or None,
+                'confirmed': anchor_record.blockchain_confirmation_state == 'confirmed',
+                'confirmed_on': fields.Datetime.to_string(anchor_record.blockchain_confirmed_date)
+                if anchor_record.blockchain_confirmed_date else None,
+            },
+        }
+        if anchor:
+            result['anchor'].update({
+                'merkle_root': anchor.merkle_root,
+                'leaf_index': user_input.blockchain_merkle_leaf_index,
+                'proof': json.loads(user_input.blockchain_merkle_proof or '[]'),
+                'proof_valid': user_input._verify_merkle_inclusion(),
+            })
+        if with_holder:
+            result['certificate'].update({
+                'survey': user_input.survey_id.title,
+                'partner': user_input.partner_id.name,
+                'state': user_input.blockchain_certificate_state or None,
+            })
+        return result
+
+    # -------------------------------------------------------------------------
+    # EXPORTACIÓN DE PRUEBAS PARA VERIFICACIÓN OFFLINE
+    # -------------------------------------------------------------------------
+
+    def _prepare_certificate_proof(self):
+        """Hash, referencia de la transacción y prueba Merkle de un certificado (fila de la exportación)."""
+        self.ensure_one()
+        anchor = self.blockchain_anchor_id
+        anchor_record = anchor or self
+        return {
+            'id': self.id,
+            'survey': self.survey_id.title,
+            'partner': self.partner_id.name,
+            'issued_on': fields.Datetime.to_string(self.end_datetime) if self.end_datetime else None,
+            'hash': self.blockchain_certificate_hash,
+            'mode': 'merkle' if anchor else 'single',
+            'status': anchor_record.blockchain_status or None,
+            'tx_reference': anchor_record.blockchain_tx_reference or anchor_record.blockchain_entry_id.display_name or None,
+            'confirmed_on': fields.Datetime.to_string(anchor_record.blockchain_confirmed_date)
+            if anchor_record.blockchain_confirmed_date else None,
+            'anchor': anchor.name or None,
+            'merkle_root': anchor.merkle_root or None,
+            'leaf_index': self.blockchain_merkle_leaf_index if anchor else None,
+            'proof': json.loads(self.blockchain_merkle_proof) if anchor and self.blockchain_merkle_proof else None,
+        }
+
+    @api.model
+    def _iter_certificate_proofs(self, domain, chunk_size=1000):
+        """
+        Genera las pruebas de los certificados con hash que cumplen 'domain' (con las reglas
+        de acceso del usuario) por bloques de 'chunk_size', paginando por id y vaciando la
+        caché entre bloques: la memoria no crece con el tamaño de la cohorte.
+        """
+        domain = expression.AND([domain, [('blockchain_certificate_hash', '!=', False)]])
+        last_id = 0
+        while True:
+            chunk = self.search(expression.AND([domain, [('id', '>', last_id)]]), limit=chunk_size, order='id')
+            if not chunk:
+                return
+            for user_input in chunk.sudo():
+                yield user_input._prepare_certificate_proof()
+            last_id = chunk[-1].id
+            self.env.invalidate_all()
+
+    def action_export_certificate_proofs(self, export_format='csv'):
+        """Acción de servidor (lista de participaciones): descarga las pruebas de los seleccionados."""
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f"/certificate/proofs/export?format={export_format}&ids={encode_id_ranges(self.ids)}",
+            'target': 'self',
+        }
+
+    def _get_certificate_pipeline_domain(self):
+        states = CERTIFICATE_PIPELINE_ACTIVE_STATES
+        if self._is_merkle_anchoring():
+            # Los certificados con hash esperan al cron de lotes, no al pipeline
+            states = tuple(state for state in states if state != 'hashed')
+        return [
+            ('blockchain_certificate_state', 'in', states),
+            '|', ('blockchain_certificate_state', '!=', 'registered'),
+                 ('blockchain_confirmation_state', '=', 'confirmed'),
+            '|', ('blockchain_certificate_next_try', '=', False),
+                 ('blockchain_certificate_next_try', '<=', fields.Datetime.now()),
+        ]
+
+    @api.model
+    def _trigger_certificate_pipeline(self):
+        cron = self.env.ref('elearning_blockchain_certification.ir_cron_certificate_pipeline', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    @api.model
+    def _cron_process_certificate_pipeline(self, batch_size=None):
+        """
+        Drena la cola de certificados pendientes por lotes.
+        Cada etapa se confirma por separado, de modo que un fallo (o una caída del worker)
+        retoma el trabajo desde la última etapa completada sin repetir el registro en cadena.
+        """
+        if batch_size is None:
+            batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
+                'elearning_blockchain_certification.pipeline_batch_size', 50))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        domain = self._get_certificate_pipeline_domain()
+        user_inputs = self.sudo().search(domain, limit=batch_size, order='id')
+
+        # Las etapas de PDF y hash se resuelven para todo el lote con una invocación
+        # de wkhtmltopdf por bloque; si falla, el bucle las reintenta registro a registro.
+        pending = user_inputs.filtered(lambda ui: ui.blockchain_certificate_state == 'pending')
+        if len(pending) > 1:
+            try:
+                with self.env.cr.savepoint():
+                    pending = pending._lock_certificate_issuance().filtered(
+                        lambda ui: ui.blockchain_certificate_state == 'pending')
+                    pending._render_and_store_certificates()
+                    pending.write({'blockchain_certificate_state': 'hashed'})
+            except Exception as e:
+                _logger.warning("Fallo en la generación por lotes de %s certificados, se reintenta uno a uno: %s",
+                                len(pending), e)
+            if auto_commit:
+                self.env.cr.commit()
+
+        for user_input in user_inputs:
+            while user_input.blockchain_certificate_state in ('pending', 'rendered', 'hashed'):
+                try:
+                    with self.env.cr.savepoint():
+                        if not user_input._advance_certificate_pipeline():
+                            break
+                except Exception as e:
+                    user_input._schedule_certificate_retry(e)
+                    break
+                finally:
+                    if auto_commit:
+                        self.env.cr.commit()
+
+        # Envío de correos de todo el lote en una pasada (adjuntos agrupados por res_id);
+        # si falla, se reintenta registro a registro para aislar el error.
+        registered = user_inputs._lock_certificate_issuance().filtered(
+            lambda ui: ui.blockchain_certificate_state == 'registered' and ui.blockchain_confirmation_state == 'confirmed')
+        if registered:
+            try:
+                with self.env.cr.savepoint():
+                    registered._certificate_stage_mail()
+            except Exception as e:
+                _logger.warning("Fallo en el envío por lotes de %s certificados, se reintenta uno a uno: %s",
+                                len(registered), e)
+                for user_input in registered:
+                    try:
+                        with self.env.cr.savepoint():
+                            user_input._advance_certificate_pipeline()
+                    except Exception as e:
+                        user_input._schedule_certificate_retry(e)
+            if auto_commit:
+                self.env.cr.commit()
+
+        if self._is_merkle_anchoring() and 'hashed' in user_inputs.mapped('blockchain_certificate_state'):
+            cron = self.env.ref('elearning_blockchain_certification.ir_cron_certificate_anchor', raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+
+        remaining = self.sudo().search_count(domain) if len(user_inputs) == batch_size else 0
+        self.env['ir.cron']._notify_progress(done=len(user_inputs), remaining=remaining)
+
+    @api.model
+    def _cron_track_certificate_confirmations(self, batch_size=None, concurrency=None):
+        """
+        Consulta en lote las confirmaciones de las transacciones pendientes (certificados
+        individuales y lotes Merkle) con 'concurrency' peticiones simultáneas al nodo,
+        actualiza el estado con escrituras agrupadas y dispara el envío de los confirmados.
+        """
+        node = get_confirmation_node(self.env)
+        if node is None:
+            return
+        ICP = self.env['ir.config_parameter'].sudo()
+        if batch_size is None:
+            batch_size = int(ICP.get_param('elearning_blockchain_certification.confirmation_batch_size', 1000))
+        if concurrency is None:
+            concurrency = int(ICP.get_param('elearning_blockchain_certification.confirmation_concurrency', 16))
+        depth = get_confirmation_depth(self.env)
+
+        Anchor = self.env['survey.certificate.anchor'].sudo()
+        # Registros sin hash de transacción que consultar: no se pueden seguir, se dan por confirmados
+        untracked = [('blockchain_confirmation_state', '=', 'unconfirmed'), ('blockchain_tx_reference', '=', False)]
+        untracked_vals = {'blockchain_confirmation_state': 'confirmed', 'blockchain_confirmed_date': fields.Datetime.now()}
+        self.sudo().search(untracked + [('blockchain_anchor_id', '=', False)]).write(untracked_vals)
+        for anchor in Anchor.search(untracked):
+            anchor.write(untracked_vals)
+            anchor.user_input_ids.filtered(lambda ui: ui.blockchain_confirmation_state == 'unconfirmed').write(untracked_vals)
+
+        domain = [('blockchain_confirmation_state', '=', 'unconfirmed'), ('blockchain_tx_reference', '!=', False)]
+        user_inputs = self.sudo().search(domain + [('blockchain_anchor_id', '=', False)], limit=batch_size, order='id')
+        anchors = Anchor.search(domain, limit=batch_size, order='id')
+
+        tx_references = set(user_inputs.mapped('blockchain_tx_reference')) | set(anchors.mapped('blockchain_tx_reference'))
+        confirmations = poll_confirmations(node, tx_references, concurrency=concurrency)
+
+        confirmed_inputs, reverted_inputs = user_inputs._update_blockchain_confirmations(confirmations, depth)
+        confirmed_anchors, reverted_anchors = anchors._update_blockchain_confirmations(confirmations, depth)
+        reverted_inputs._handle_reverted_registration()
+        reverted_anchors._handle_reverted_registration()
+        for anchor in confirmed_anchors:
+            anchor.user_input_ids.filtered(
+                lambda ui: ui.blockchain_confirmation_state != 'confirmed'
+            ).write({
+                'blockchain_confirmation_state': 'confirmed',
+                'blockchain_confirmed_date': anchor.blockchain_confirmed_date,
+            })
+
+        _logger.info("Confirmaciones: %s/%s certificados y %s/%s lotes confirmados, %s y %s revertidos",
+                     len(confirmed_inputs), len(user_inputs), len(confirmed_anchors), len(anchors),
+                     len(reverted_inputs), len(reverted_anchors))
+        if confirmed_inputs or confirmed_anchors:
+            self._trigger_certificate_pipeline()
+        done_inputs = confirmed_inputs | reverted_inputs
+        done_anchors = confirmed_anchors | reverted_anchors
+        self.env['ir.cron']._notify_progress(
+            done=len(done_inputs) + len(done_anchors),
+            remaining=len(user_inputs - done_inputs) + len(anchors - done_anchors),
+        )
+
+    def _handle_reverted_registration(self):
+        """
+        La transacción de registro se ha revertido: el certificado no está en cadena.
+        Se marca como fallido para que un gestor lo reintente (action_retry_certificate_pipeline
+        lo vuelve a registrar con una clave de idempotencia nueva).
         """
-        Sobrescribe _mark_done para usar la lógica nativa de Odoo (colas, templates, chatter)
-        pero inyectando nuestro PDF inmutable en lugar del dinámico.
-        """
-        # 1. PROCESO STANDARD
-        # Llamamos primero a super para que Odoo calcule puntuaciones y determine si pasó.
-        res = super(SurveyUserInput, self)._mark_done()
-        
-        # 2. LÓGICA BLOCKCHAIN & VISIBILIDAD (Solo si Standard ya terminó)
-        # Pre-calculamos IDs necesarios
-        comment_subtype_id = self.env.ref('mail.mt_comment').id
-        
         for user_input in self:
-            # CHECK: Solo procedemos si el intento fue EXITOSO (Aprobó)
-            if not user_input.scoring_success:
+            user_input.write({
+                'blockchain_certificate_state': 'failed',
+                'blockchain_certificate_next_try': False,
+                'blockchain_certificate_error': _("La transacción de registro %(tx)s se ha revertido.",
+                                                  tx=user_input.blockchain_tx_reference),
+            })
+            user_input.message_post(
+                body=_("La transacción de registro en blockchain %(tx)s se ha revertido: el certificado no está "
+                       "registrado. Reintente la emisión.", tx=user_input.blockchain_tx_reference),
+                subtype_xmlid='mail.mt_note',
+            )
+
+    def action_retry_certificate_pipeline(self):
+        """Reencola los certificados fallidos desde la etapa en la que se quedaron."""
+        failed = self.filtered(lambda ui: ui.blockchain_certificate_state == 'failed')
+        for user_input in failed:
+            vals = {
+                'blockchain_certificate_attempts': 0,
+                'blockchain_certificate_next_try': False,
+                'blockchain_certificate_error': False,
+            }
+            anchor = user_input.blockchain_anchor_id
+            if not anchor and user_input.blockchain_confirmation_state == 'failed':
+                # Transacción revertida: nuevo registro con otra clave de idempotencia
+                vals.update({
+                    'blockchain_certificate_state': 'hashed',
+                    'blockchain_entry_id': False,
+                    'blockchain_tx_reference': False,
+                    'blockchain_confirmation_state': False,
+                    'blockchain_confirmations': 0,
+                    'blockchain_confirmed_date': False,
+                    'blockchain_issuance_key': user_input._get_certificate_issuance_key(
+                        user_input.blockchain_certificate_hash, revision=user_input.blockchain_tx_reference),
+                })
+            elif anchor.state == 'registered':
+                # Ya anclado en un lote registrado: solo falta el correo
+                vals.update({
+                    'blockchain_certificate_state': 'registered',
+                    'blockchain_confirmation_state': anchor.blockchain_confirmation_state,
+                    'blockchain_confirmed_date': anchor.blockchain_confirmed_date,
+                })
+            elif anchor:
+                # Lote sellado pendiente de registro: el cron de lotes lo registrará
+                vals['blockchain_certificate_state'] = 'hashed'
+            elif user_input.blockchain_entry_id or user_input.blockchain_tx_reference:
+                # Ya registrado en cadena: no se vuelve a registrar
+                vals['blockchain_certificate_state'] = 'registered'
+                if not user_input.blockchain_confirmation_state:
+                    vals.update(user_input._get_blockchain_submission_vals(user_input._get_blockchain_tx_reference()))
+            elif user_input.blockchain_certificate_hash:
+                vals['blockchain_certificate_state'] = 'hashed'
+            elif user_input.blockchain_certificate_file_id:
+                vals['blockchain_certificate_state'] = 'rendered'
+            else:
+                vals['blockchain_certificate_state'] = 'pending'
+            user_input.write(vals)
+        if failed:
+            self._trigger_certificate_pipeline()
+
+    # -------------------------------------------------------------------------
+    # BACKFILL / RE-ANCLAJE DE CERTIFICADOS HISTÓRICOS
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _get_certificate_backfill_domain(self):
+        """
+        Intentos aprobados y certificables sin hash o sin anclaje, fuera del pipeline.
+        El ledger simulado solo deja la referencia de la transacción, sin entrada del core.
+        """
+        return [
+            ('state', '=', 'done'),
+            ('scoring_success', '=', True),
+            ('test_entry', '=', False),
+            ('blockchain_eligible', '=', True),
+            ('blockchain_certificate_state', 'not in', CERTIFICATE_PIPELINE_ACTIVE_STATES),
+            '|', ('blockchain_certificate_hash', '=', False),
+                 '&', '&', ('blockchain_entry_id', '=', False), ('blockchain_anchor_id', '=', False),
+                      ('blockchain_tx_reference', '=', False),
+        ]
+
+    def action_enqueue_blockchain_certificates(self):
+        """Acción de servidor (lista de participaciones): encola los seleccionados en el pipeline."""
+        to_enqueue = self.filtered_domain(self._get_certificate_backfill_domain())
+        with_hash = to_enqueue.filtered('blockchain_certificate_hash')
+        vals = {
+            'blockchain_certificate_attempts': 0,
+            'blockchain_certificate_next_try': False,
+            'blockchain_certificate_error': False,
+        }
+        # Los que ya tenían hash recibieron su certificado: solo se re-anclan, sin correo
+        with_hash.write(dict(vals, blockchain_certificate_state='hashed', blockchain_certificate_mailed=True))
+        (to_enqueue - with_hash).write(dict(vals, blockchain_certificate_state='pending'))
+        if to_enqueue:
+            self._trigger_certificate_pipeline()
+        return to_enqueue
+
+    @api.model
+    def _backfill_blockchain_certificates(self, chunk_size=None, concurrency=None, max_chunks=None):
+        """
+        Certifica retroactivamente los intentos históricos por bloques, confirmando cada bloque.
+        Es reanudable: un intento procesado sale del dominio, así que tras una caída basta con
+        volver a ejecutarlo. Invocable desde cron o desde la línea de comandos:
+
+            odoo-bin shell -d <db> <<< "env['survey.user_input']._backfill_blockchain_certificates()"
+
+        :param chunk_size: intentos por transacción (parámetro 'backfill_chunk_size', 100)
+        :param concurrency: registros simultáneos contra el core blockchain ('backfill_concurrency', 4)
+        :param max_chunks: límite de bloques por ejecución (None = hasta vaciar)
+        :return: (procesados, pendientes)
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        if chunk_size is None:
+            chunk_size = int(ICP.get_param('elearning_blockchain_certification.backfill_chunk_size', 100))
+        if concurrency is None:
+            concurrency = int(ICP.get_param('elearning_blockchain_certification.backfill_concurrency', 4))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        UserInput = self.sudo()
+        domain = self._get_certificate_backfill_domain()
+        if self.ids:
+            domain += [('id', 'in', self.ids)]
+        total = UserInput.search_count(domain)
+        processed, skipped_ids, chunks = 0, [], 0
+        _logger.info("Backfill de certificados blockchain: %s intentos por procesar", total)
+
+        while max_chunks is None or chunks < max_chunks:
+            chunk = UserInput.search(domain + [('id', 'not in', skipped_ids)], limit=chunk_size, order='id')
+            if not chunk:
+                break
+            chunks += 1
+
+            # 1. PDF + hash de todo el bloque (los que ya tienen hash solo se re-anclan)
+            # Los que no tenían hash nunca recibieron su certificado inmutable: el pipeline se lo enviará.
+            needs_mail = chunk.filtered(lambda ui: not ui.blockchain_certificate_hash)
+            try:
+                with self.env.cr.savepoint():
+                    needs_mail._render_and_store_certificates()
+                    chunk.write({'blockchain_certificate_state': 'hashed'})
+                    # Marca persistente: ni el cron de lotes ni los reintentos les reenviarán el correo
+                    (chunk - needs_mail).write({'blockchain_certificate_mailed': True})
+            except Exception as e:
+                _logger.error("Backfill: fallo generando el bloque %s-%s: %s", chunk[:1].id, chunk[-1:].id, e)
+                skipped_ids += chunk.ids
                 continue
+            if auto_commit:
+                self.env.cr.commit()
 
-            # Determinar si aplica Blockchain
-            is_blockchain = user_input._should_certify_on_blockchain()
-            
-            # --- GENERACIÓN Y REGISTRO BLOCKCHAIN ---
-            if is_blockchain:
+            # 2. Registro en blockchain (en modo Merkle lo hará el cron de lotes)
+            if not self._is_merkle_anchoring():
+                errors = chunk._register_certificates_concurrently(concurrency if auto_commit else 1)
+                chunk.invalidate_recordset()
+                for user_input in chunk.filtered(lambda ui: ui.id in errors):
+                    user_input._schedule_certificate_retry(errors[user_input.id])
+                (chunk - needs_mail).filtered(
+                    lambda ui: ui.blockchain_certificate_state == 'registered'
+                ).write({'blockchain_certificate_state': 'mailed'})
+                skipped_ids += list(errors)
+
+            if auto_commit:
+                self.env.cr.commit()
+            processed += len(chunk)
+            _logger.info("Backfill de certificados blockchain: %s/%s procesados", processed, total)
+
+        remaining = UserInput.search_count(domain + [('id', 'not in', skipped_ids)])
+        self._trigger_certificate_pipeline()
+        return processed, remaining
+
+    def _register_certificates_concurrently(self, concurrency):
+        """
+        Registra cada certificado en su propia transacción, con como mucho 'concurrency'
+        llamadas simultáneas al core blockchain. Devuelve {user_input_id: error}.
+        """
+        if concurrency <= 1:
+            errors = {}
+            for user_input in self:
                 try:
-                    # Generamos el certificado AHORA, sabiendo que aprobó.
-                    user_input._generate_and_store_certificate()
-                    # Registramos transacción
-                    user_input.action_blockchain_register()
+                    with self.env.cr.savepoint():
+                        user_input._advance_certificate_pipeline()
                 except Exception as e:
-                    _logger.error('Error proceso blockchain en _mark_done: %s', e)
+                    errors[user_input.id] = str(e)
+            return errors
 
-        # 3. POST-PROCESO: Interceptación, Canje y Visibilidad
-        for user_input in self:
-            # Buscamos el correo recién creado en cola
-            last_mail = self.env['mail.mail'].sudo().search([
+        dbname, uid, context, su = self.env.cr.dbname, self.env.uid, dict(self.env.context), self.env.su
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = executor.map(
+                lambda user_input_id: _register_certificate_in_new_cursor(dbname, uid, context, su, user_input_id),
+                self.ids,
+            )
+            return {user_input_id: error for user_input_id, error in zip(self.ids, results) if error}
+
+    @api.model
+    def _cron_backfill_blockchain_certificates(self):
+        processed, remaining = self._backfill_blockchain_certificates(max_chunks=10)
+        self.env['ir.cron']._notify_progress(done=processed, remaining=remaining)
+
+    def _mark_done(self):
+        """
+        Sobrescribe _mark_done para usar la lógica nativa de Odoo (colas, templates, chatter)
+        pero delegando la emisión blockchain (PDF, hash, registro y correo) al pipeline asíncrono.
+        La petición del alumno solo encola el trabajo; el cron lo procesa por lotes.
+        """
+        # 1. Determinar qué intentos aprobados van a blockchain
+        # scoring_success se calcula con las respuestas, no depende del estado 'done'.
+        with span('eligibility', size=len(self)):
+            passed_inputs = self.filtered('scoring_success')
+            blockchain_inputs = passed_inputs._filter_blockchain_certifiable()
+
+        # 2. PROCESO STANDARD
+        # El correo de certificación de los intentos blockchain se retiene (ver mail.template.send_mail)
+        # y lo envía el pipeline cuando el PDF inmutable esté listo.
+        # report_pdf_no_attachment evita que el render del correo guarde 'certification.pdf'
+        # en el registro (antes se creaba y después se borraba como duplicado).
+        res = super(SurveyUserInput, self.with_context(
+            blockchain_certificate_deferred_ids=blockchain_inputs.ids,
+            report_pdf_no_attachment=True,
+        ))._mark_done()
+
+        # 3. ENCOLAR EMISIÓN BLOCKCHAIN
+        if blockchain_inputs:
+            blockchain_inputs.write({
+                'blockchain_certificate_state': 'pending',
+                'blockchain_certificate_attempts': 0,
+                'blockchain_certificate_next_try': False,
+                'blockchain_certificate_error': False,
+            })
+            self._trigger_certificate_pipeline()
+
+        # 4. POST-PROCESO STANDARD: Visibilidad
+        # Una sola búsqueda de correos salientes para todos los intentos, indexada por res_id.
+        standard_inputs = passed_inputs - blockchain_inputs
+        if standard_inputs:
+            last_mails = {}
+            for mail in self.env['mail.mail'].sudo().search([
                 ('model', '=', 'survey.user_input'),
-                ('res_id', '=', user_input.id),
+                ('res_id', 'in', standard_inputs.ids),
                 ('state', '=', 'outgoing')
-            ], order='create_date desc', limit=1)
-
-            is_blockchain = user_input._should_certify_on_blockchain()
-
-            # Caso Blockchain: SWAP + Visibilidad Garantizada
-            if is_blockchain and user_input.scoring_success:
-                immutable_att = user_input._get_immutable_certificate_attachment()
-                
-                if immutable_att and last_mail:
-                    _logger.info("Interceptado Mail ID %s para inyección (Blockchain).", last_mail.id)
-                    
-                    # 1. Swap en correo (Lo que le llega al usuario)
-                    last_mail.write({'attachment_ids': [(6, 0, [immutable_att.id])]})
-
-                    # 2. Visibilidad Garantizada en Chatter
-                    if last_mail.body_html or last_mail.body:
+            ], order='create_date desc, id desc'):
+                last_mails.setdefault(mail.res_id, mail)
+
+            for user_input in standard_inputs:
+                last_mail = last_mails.get(user_input.id)
+
+                # Visibilidad en Chatter
+                # Replicamos el contenido del correo en el chatter si Odoo no lo hizo visible.
+                if last_mail and (last_mail.body_html or last_mail.body):
+                    with span('chatter_post'):
                         user_input.message_post(
                             body=Markup(last_mail.body_html or last_mail.body),
-                            attachment_ids=[immutable_att.id],
+                            # Usamos el adjunto original del correo (debería ser el PDF standard)
+                            attachment_ids=last_mail.attachment_ids.ids,
                             subtype_xmlid='mail.mt_comment',
                             message_type='comment'
                         )
-                    
-                    # 3. Limpiar basura dinamica
-                    garbage = self.env['ir.attachment'].sudo().search([
-                        ('res_model', '=', 'survey.user_input'),
-                        ('res_id', '=', user_input.id),
-                        ('name', '=', 'certification.pdf'),
-                        ('id', '!=', immutable_att.id)
-                    ])
-                    if garbage:
-                        garbage.unlink()
-
-            # Caso Standard: Solo Visibilidad + Limpieza Safe
-            elif user_input.scoring_success:
-                # Visibilidad en Chatter
-                # Replicamos el contenido del correo en el chatter si Odoo no lo hizo visible.
-                if last_mail and (last_mail.body_html or last_mail.body):
-                     user_input.message_post(
-                        body=Markup(last_mail.body_html or last_mail.body),
-                        # Usamos el adjunto original del correo (debería ser el PDF standard)
-                        attachment_ids=[att.id for att in last_mail.attachment_ids],
-                        subtype_xmlid='mail.mt_comment',
-                        message_type='comment'
-                    )
-
-                # Limpieza de duplicados
-                garbage_standard = self.env['ir.attachment'].sudo().search([
-                    ('res_model', '=', 'survey.user_input'),
-                    ('res_id', '=', user_input.id),
-                    ('name', '=', 'certification.pdf')
-                ])
-                for att in garbage_standard:
-                    other_count = self.env['ir.attachment'].sudo().search_count([
-                        ('res_model', '=', 'survey.user_input'),
-                        ('res_id', '=', att.res_id),
-                        ('id', '!=', att.id)
-                    ])
-                    if other_count > 0:
-                        _logger.info("Limpieza Standard: Eliminando duplicado ID %s", att.id)
-                        att.unlink()
 
         return res
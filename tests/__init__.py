@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+from . import test_sale_order_enrollment
+from . import test_certificate_batching
+from . import test_certificate_reproducibility
+from . import test_certificate_file_unlink
+from . import test_benchmark
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import base64
+import io
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from odoo.tests import TransactionCase
+
+
+def make_background_pdf():
+    """PDF de fondo de una página para el motor de superposición."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    pdf.drawString(50, 50, "Fondo de certificado")
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+class BlockchainCertificationCommon(TransactionCase):
+    """Cursos de pago con certificación blockchain y alumnos compartidos por los tests del módulo."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.partners = cls.env['res.partner'].create([
+            {'name': f"Alumno {i}", 'email': f"alumno.{i}@example.com"} for i in range(10)
+        ])
+
+    @classmethod
+    def _create_paid_course(cls, name, price=100.0, certification_price=10.0):
+        product = cls.env['product.product'].create({
+            'name': name,
+            'list_price': price,
+            'type': 'service',
+            'service_tracking': 'course',
+            'invoice_policy': 'order',
+            'is_published': True,
+        })
+        return cls.env['slide.channel'].create({
+            'name': name,
+            'enroll': 'payment',
+            'product_id': product.id,
+            'blockchain_certification_enabled': True,
+            'blockchain_certification_price': certification_price,
+        })
+
+    @classmethod
+    def _get_course_variants(cls, channel):
+        """Variantes (estándar, certificado blockchain) del producto del curso."""
+        _attr, val_std, val_cert = channel._get_blockchain_attribute()
+        variants = channel.product_id.product_tmpl_id.product_variant_ids
+        return (
+            variants.filtered(lambda p: val_std in p.product_template_attribute_value_ids.product_attribute_value_id),
+            variants.filtered(lambda p: val_cert in p.product_template_attribute_value_ids.product_attribute_value_id),
+        )
+
+    @classmethod
+    def _create_certification_survey(cls, title="Certificación Blockchain", engine='overlay'):
+        """Encuesta de certificación de una pregunta con el motor de render indicado."""
+        return cls.env['survey.survey'].create({
+            'title': title,
+            'certification': True,
+            'scoring_type': 'scoring_without_answers',
+            'scoring_success_min': 50,
+            'certification_mail_template_id': cls.env.ref('survey.mail_template_certification').id,
+            'certificate_render_engine': engine,
+            'certificate_overlay_background': base64.b64encode(make_background_pdf()) if engine == 'overlay' else False,
+            'question_and_page_ids': [(0, 0, {
+                'title': "¿Pregunta?",
+                'question_type': 'simple_choice',
+                'suggested_answer_ids': [
+                    (0, 0, {'value': "Correcta", 'is_correct': True, 'answer_score': 1}),
+                    (0, 0, {'value': "Incorrecta"}),
+                ],
+            })],
+        })
+
+    @classmethod
+    def _create_certification_slide(cls, survey, partners):
+        """
+        Curso con certificación blockchain gratuita y la encuesta como slide de certificación,
+        con los alumnos inscritos: sus intentos son certificables en blockchain.
+        """
+        channel = cls.env['slide.channel'].create({
+            'name': f"Curso {survey.title}",
+            'blockchain_certification_enabled': True,
+            'blockchain_certification_price': 0.0,
+        })
+        slide = cls.env['slide.slide'].create({
+            'name': survey.title,
+            'channel_id': channel.id,
+            'slide_category': 'certification',
+            'survey_id': survey.id,
+            'blockchain_certifiable': True,
+            'is_published': True,
+        })
+        channel._action_add_members(partners)
+        return slide
+
+    @classmethod
+    def _create_passed_attempts(cls, survey, partners, slide=None, done=True):
+        """Un intento aprobado por alumno; con ``done=False`` queda en curso, a falta de _mark_done."""
+        question = survey.question_ids
+        correct = question.suggested_answer_ids.filtered('is_correct')
+        user_inputs = cls.env['survey.user_input'].create([{
+            'survey_id': survey.id,
+            'partner_id': partner.id,
+            'email': partner.email,
+            'slide_id': slide.id if slide else False,
+            'state': 'done' if done else 'in_progress',
+            'end_datetime': '2026-01-15 10:00:00' if done else False,
+        } for partner in partners])
+        cls.env['survey.user_input.line'].create([{
+            'user_input_id': user_input.id,
+            'survey_id': survey.id,
+            'question_id': question.id,
+            'answer_type': 'suggestion',
+            'suggested_answer_id': correct.id,
+        } for user_input in user_inputs])
+        return user_inputs
+
+    def _count_queries(self, func):
+        """Consultas SQL de 'func' con la caché vacía, incluido el flush final."""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        func()
+        self.env.flush_all()
+        return self.cr.sql_log_count - start
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo.tests import TransactionCase, tagged
+
+from ..tools.benchmark import run_certification_benchmark
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('benchmark', '-standard', 'post_install', '-at_install')
+class TestCertificationBenchmark(TransactionCase):
+    """
+    Benchmark del flujo de certificación contra el ledger simulado. Fuera de la suite
+    estándar; se lanza con:
+
+        odoo-bin -d <db> -u elearning_blockchain_certification --test-tags benchmark --stop-after-init
+    """
+
+    def test_certification_throughput(self):
+        # Sin latencia del ledger: se mide el coste del módulo. El framework deshace los datos.
+        results = run_certification_benchmark(self.env, sizes=(1, 100, 10000), latency=0.0, rollback=False)
+        for result in results:
+            _logger.info("Benchmark %s intentos: p50 %.3fs, p95 %.3fs, %.1f cert/s, consultas por fase %s",
+                         result['size'], result['p50_seconds'], result['p95_seconds'],
+                         result['certificates_per_second'],
+                         {name: stats['queries'] for name, stats in result['phases'].items()})
+            self.assertEqual(result['certified'], result['size'])
+            self.assertLessEqual(result['p50_seconds'], result['p95_seconds'])
+            self.assertEqual(result['ledger_failures'], 0)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import BlockchainCertificationCommon
+
+
+@tagged('post_install', '-at_install')
+class TestCertificateBatching(BlockchainCertificationCommon):
+    """Las etapas por lotes del pipeline no hacen más consultas por tener más registros."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.survey = cls._create_certification_survey()
+        cls.attempts = cls._create_passed_attempts(cls.survey, cls.partners)
+
+    def test_render_query_count_independent_of_batch_size(self):
+        # Calentar cachés (fondo de la encuesta, parámetros) con un primer render
+        self.attempts[9]._render_and_store_certificates()
+
+        baseline = self._count_queries(self.attempts[0]._render_and_store_certificates)
+
+        batch = self.attempts[1:9]
+        self.env.invalidate_all()
+        with self.assertQueryCount(baseline):
+            batch._render_and_store_certificates(chunk_size=len(batch))
+
+        self.assertTrue(all(batch.mapped('blockchain_certificate_file_id')))
+        self.assertEqual(len(set(batch.mapped('blockchain_certificate_hash'))), len(batch))
+
+    def test_mail_stage_renders_template_once_per_batch(self):
+        self.attempts._render_and_store_certificates()
+        self.attempts[9]._certificate_stage_mail()
+
+        single = self._count_queries(self.attempts[0]._certificate_stage_mail)
+        # Cada alumno recibe su propio mensaje: lo único que crece con el lote es publicarlo y notificarlo
+        attempt = self.attempts[9]
+        attachment = attempt._get_immutable_certificate_attachment()
+        post = self._count_queries(lambda: attempt.with_context(
+            blockchain_certificate_force_email=attempt.partner_id.ids,
+        ).message_post(
+            body="<p>Certificado</p>",
+            subject="Certificado",
+            partner_ids=attempt.partner_id.ids,
+            attachment_ids=attachment.ids,
+            email_layout_xmlid='mail.mail_notification_light',
+            subtype_xmlid='mail.mt_comment',
+            message_type='comment',
+        ))
+
+        Template = type(self.env['mail.template'])
+        render_field = Template._render_field
+        rendered = []
+
+        def counting_render_field(template, field, res_ids, *args, **kwargs):
+            rendered.append((field, tuple(res_ids)))
+            return render_field(template, field, res_ids, *args, **kwargs)
+
+        batch = self.attempts[1:9]
+        self.env.invalidate_all()
+        with patch.object(Template, '_render_field', counting_render_field), \
+                self.assertQueryCount(single + (len(batch) - 1) * post):
+            batch._certificate_stage_mail()
+
+        # Una sola pasada de render por campo de la plantilla para todo el lote
+        self.assertEqual(sorted(rendered), [
+            (field, tuple(batch.ids)) for field in ('body_html', 'email_from', 'subject')
+        ])
+
+        self.assertEqual(set(batch.mapped('blockchain_certificate_state')), {'mailed'})
+        self.assertTrue(all(batch.mapped('blockchain_certificate_mailed')))
+        for user_input in batch:
+            message = user_input.message_ids.filtered(lambda m: m.message_type == 'comment')[:1]
+            self.assertEqual(message.attachment_ids, user_input.blockchain_certificate_file_id.attachment_id)
+
+    def test_mark_done_query_count_independent_of_batch_size(self):
+        survey = self._create_certification_survey(title="Certificación del Curso")
+        partners = self.partners | self.env['res.partner'].create([
+            {'name': f"Alumno Extra {i}", 'email': f"alumno.extra.{i}@example.com"} for i in range(2)
+        ])
+        slide = self._create_certification_slide(survey, partners)
+        attempts = self._create_passed_attempts(survey, partners, slide=slide, done=False)
+        self.assertTrue(all(attempts.mapped('blockchain_eligible')))
+
+        # Calentar cachés (plantilla, cron del pipeline) con un primer intento
+        attempts[11]._mark_done()
+
+        baseline = self._count_queries(attempts[0]._mark_done)
+
+        batch = attempts[1:11]
+        self.env.flush_all()
+        self.env.invalidate_all()
+        with self.assertQueryCount(baseline):
+            batch._mark_done()
+            self.env.flush_all()
+
+        self.assertEqual(set(batch.mapped('state')), {'done'})
+        # El correo de certificación queda retenido para el pipeline
+        self.assertEqual(set(batch.mapped('blockchain_certificate_state')), {'pending'})
+        self.assertFalse(self.env['mail.mail'].search([
+            ('model', '=', 'survey.user_input'), ('res_id', 'in', batch.ids),
+        ]))
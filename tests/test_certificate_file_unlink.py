@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+from odoo.tests import tagged
+
+from .common import BlockchainCertificationCommon
+
+
+@tagged('post_install', '-at_install')
+class TestCertificateFileUnlink(BlockchainCertificationCommon):
+    """Borrar participaciones o encuestas certificadas no choca con el almacén de certificados."""
+
+    def test_unlink_certified_attempt(self):
+        survey = self._create_certification_survey()
+        attempts = self._create_passed_attempts(survey, self.partners[:2])
+        attempts._render_and_store_certificates()
+        certificate_file = attempts[0].blockchain_certificate_file_id
+        attachment = certificate_file.attachment_id
+
+        attempts[0].unlink()
+
+        self.assertFalse(certificate_file.exists())
+        self.assertFalse(attachment.exists())
+        self.assertTrue(attempts[1].blockchain_certificate_file_id.attachment_id)
+
+    def test_unlink_survey_keeps_shared_background(self):
+        # Dos encuestas con el mismo fondo comparten su fichero en el almacén
+        survey_a = self._create_certification_survey(title="Certificación A")
+        survey_b = self._create_certification_survey(title="Certificación B")
+        attempt_a = self._create_passed_attempts(survey_a, self.partners[:1])
+        attempt_b = self._create_passed_attempts(survey_b, self.partners[1:2])
+        attempt_a._render_and_store_certificates()
+        attempt_b._render_and_store_certificates()
+        background_file = survey_b._get_certificate_overlay_background_file()
+        self.assertEqual(background_file.attachment_id.res_id, survey_a.id)
+
+        survey_a.unlink()
+
+        self.assertTrue(background_file.exists())
+        self.assertEqual(background_file.attachment_id.res_id, survey_b.id)
+        certificate_file = attempt_b.blockchain_certificate_file_id
+        pdf_content = certificate_file._regenerate_contents()
+        self.assertEqual(hashlib.sha256(pdf_content).hexdigest(), certificate_file.sha256)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import tempfile
+
+from odoo.tests import tagged
+
+from .common import BlockchainCertificationCommon
+
+
+@tagged('post_install', '-at_install')
+class TestCertificateReproducibility(BlockchainCertificationCommon):
+    """El PDF del motor de superposición se regenera byte a byte desde los datos fijados."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.survey = cls._create_certification_survey()
+        cls.attempt = cls._create_passed_attempts(cls.survey, cls.partners[:1])
+
+    def test_regenerated_pdf_has_same_sha256(self):
+        self.attempt._render_and_store_certificates()
+        certificate_file = self.attempt.blockchain_certificate_file_id
+        self.assertEqual(hashlib.sha256(certificate_file.attachment_id.raw).hexdigest(), certificate_file.sha256)
+
+        pdf_content = certificate_file._regenerate_contents()
+        self.assertTrue(pdf_content, "El certificado de superposición debe ser reproducible")
+        self.assertEqual(hashlib.sha256(pdf_content).hexdigest(), certificate_file.sha256)
+
+    def test_pinned_inputs_ignore_later_changes(self):
+        self.attempt._render_and_store_certificates()
+        certificate_file = self.attempt.blockchain_certificate_file_id
+        inputs = json.loads(self.attempt.blockchain_certificate_inputs)
+        self.assertEqual(inputs['engine'], 'overlay')
+
+        # Cambiar el nombre del alumno, el título o el fondo no altera la regeneración
+        self.attempt.partner_id.name = "Otro Nombre"
+        self.survey.write({'title': "Otro Título"})
+        pdf_content = certificate_file._regenerate_contents()
+        self.assertEqual(hashlib.sha256(pdf_content).hexdigest(), certificate_file.sha256)
+
+    def test_evict_and_rehydrate(self):
+        self.attempt._render_and_store_certificates()
+        certificate_file = self.attempt.blockchain_certificate_file_id
+
+        evicted = certificate_file._evict_reproducible()
+        self.assertEqual(evicted, certificate_file)
+        self.assertEqual(certificate_file.storage_state, 'evicted')
+        self.assertEqual(certificate_file.reproducibility, 'reproducible')
+        self.assertFalse(certificate_file.attachment_id)
+
+        attachment = self.attempt._get_immutable_certificate_attachment()
+        self.assertEqual(certificate_file.storage_state, 'stored')
+        self.assertEqual(hashlib.sha256(attachment.raw).hexdigest(), certificate_file.sha256)
+
+    def test_archive_keeps_attachment_name(self):
+        self.env['ir.config_parameter'].sudo().set_param(
+            'elearning_blockchain_certification.cold_storage_path', tempfile.mkdtemp())
+        self.attempt._render_and_store_certificates()
+        certificate_file = self.attempt.blockchain_certificate_file_id
+        name = certificate_file.attachment_id.name
+        self.assertTrue(name.startswith('Certificado_'))
+
+        self.assertEqual(certificate_file._archive_to_cold_storage(), certificate_file)
+        self.assertEqual(certificate_file.storage_state, 'archived')
+        self.assertEqual(certificate_file.attachment_name, name)
+
+        attachment = self.attempt._get_immutable_certificate_attachment()
+        self.assertEqual(attachment.name, name)
+        self.assertEqual(hashlib.sha256(attachment.raw).hexdigest(), certificate_file.sha256)
+
+    def test_qweb_certificate_is_not_evicted(self):
+        survey = self._create_certification_survey(title="Certificación QWeb", engine='qweb')
+        attempt = self._create_passed_attempts(survey, self.partners[1:2])
+        attempt._pin_certificate_inputs()
+        self.assertFalse(attempt._is_certificate_reproducible())
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+
+from .common import BlockchainCertificationCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleOrderEnrollment(BlockchainCertificationCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.channels = cls.env['slide.channel'].union(*(
+            cls._create_paid_course(f"Curso Blockchain {i}") for i in range(10)
+        ))
+        cls.variants = [cls._get_course_variants(channel) for channel in cls.channels]
+
+    def _create_order(self, partner, products):
+        return self.env['sale.order'].create({
+            'partner_id': partner.id,
+            'order_line': [(0, 0, {'product_id': product.id}) for product in products],
+        })
+
+    def _get_enrollment(self, channel, partner):
+        return self.env['slide.channel.partner'].sudo().search([
+            ('channel_id', '=', channel.id), ('partner_id', '=', partner.id),
+        ])
+
+    def test_confirm_order_grants_rights_per_variant(self):
+        partner = self.partners[0]
+        (std_0, _cert_0), (_std_1, cert_1) = self.variants[0], self.variants[1]
+        self._create_order(partner, std_0 | cert_1).action_confirm()
+
+        self.assertFalse(self._get_enrollment(self.channels[0], partner).blockchain_certification_rights)
+        self.assertTrue(self._get_enrollment(self.channels[1], partner).blockchain_certification_rights)
+
+    def test_confirm_order_blockchain_variant_prevails(self):
+        partner = self.partners[1]
+        std, cert = self.variants[2]
+        self._create_order(partner, std | cert).action_confirm()
+        self.assertTrue(self._get_enrollment(self.channels[2], partner).blockchain_certification_rights)
+
+    def test_confirm_order_with_variant_archived_since_quote(self):
+        partner = self.partners[4]
+        _std, cert = self.variants[3]
+        order = self._create_order(partner, cert)
+        cert.action_archive()
+        order.action_confirm()
+        self.assertTrue(self._get_enrollment(self.channels[3], partner).blockchain_certification_rights)
+
+    def test_confirm_order_query_count_independent_of_lines(self):
+        # Calentar cachés (ormcache de atributos, plantillas de correo...) con un primer pedido
+        self._create_order(self.partners[9], self.variants[9][1]).action_confirm()
+
+        single_line = self._create_order(self.partners[2], self.variants[0][1])
+        baseline = self._count_queries(single_line.action_confirm)
+
+        products = self.env['product.product'].union(*(cert for _std, cert in self.variants[1:9]))
+        many_lines = self._create_order(self.partners[3], products)
+        self.env.invalidate_all()
+        with self.assertQueryCount(baseline):
+            many_lines.action_confirm()
+
+        enrollments = self.env['slide.channel.partner'].sudo().search([
+            ('channel_id', 'in', self.channels[1:9].ids), ('partner_id', '=', self.partners[3].id),
+        ])
+        self.assertEqual(len(enrollments), 8)
+        self.assertTrue(all(enrollments.mapped('blockchain_certification_rights')))
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+from . import ledger
+from . import merkle
+from . import metrics
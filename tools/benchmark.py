@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del flujo de certificación contra el ledger simulado (``tools/ledger.py``).
+
+Mide, para N intentos aprobados, la inscripción de los alumnos, ``_mark_done`` y las
+etapas del pipeline (PDF + hash, registro, correo): latencia p50/p95 por certificado,
+certificados por segundo y número de consultas SQL por fase. Se ejecuta desde la shell
+de Odoo sobre una base de datos de pruebas; por defecto deshace todos los cambios:
+
+    odoo-bin shell -d <db> <<'EOF'
+    from odoo.addons.elearning_blockchain_certification.tools.benchmark import run_certification_benchmark
+    run_certification_benchmark(env, sizes=(1, 100, 10000))
+    EOF
+
+``run_enrollment_benchmark`` mide la inscripción masiva en un curso con certificación
+gratuita (derechos concedidos al crear la inscripción) para 1k, 10k y 100k alumnos.
+
+``run_render_benchmark`` compara los motores de render del certificado (QWeb/wkhtmltopdf
+y plantilla superpuesta) sobre intentos aprobados de una encuesta con fondo PDF.
+"""
+import logging
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from .ledger import MockLedger
+
+_logger = logging.getLogger(__name__)
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+class _PhaseRecorder:
+    """Acumula tiempo y consultas SQL por fase."""
+
+    def __init__(self, cr):
+        self.cr = cr
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = self.phases.setdefault(name, {'seconds': 0.0, 'queries': 0})
+            stats['seconds'] += time.perf_counter() - start
+            stats['queries'] += self.cr.sql_log_count - queries
+
+
+def _create_partners(env, size, tag):
+    return env['res.partner'].create([
+        {'name': f"Alumno {tag} {i}", 'email': f"bench.{tag}.{i}@example.com"} for i in range(size)
+    ])
+
+
+def _create_fixtures(env, size, tag, certification_price=10.0):
+    """
+    Encuesta de certificación con una pregunta, curso con certificación blockchain y N alumnos.
+    Con ``certification_price`` 0 la certificación es gratuita: los derechos se conceden al inscribir.
+    """
+    survey = env['survey.survey'].create({
+        'title': f"Benchmark {tag}",
+        'certification': True,
+        'scoring_type': 'scoring_without_answers',
+        'scoring_success_min': 50,
+        'certification_mail_template_id': env.ref('survey.mail_template_certification').id,
+        'question_and_page_ids': [(0, 0, {
+            'title': "¿Pregunta?",
+            'question_type': 'simple_choice',
+            'suggested_answer_ids': [
+                (0, 0, {'value': "Correcta", 'is_correct': True, 'answer_score': 1}),
+                (0, 0, {'value': "Incorrecta"}),
+            ],
+        })],
+    })
+    channel = env['slide.channel'].create({
+        'name': f"Benchmark {tag}",
+        'blockchain_certification_enabled': True,
+        'blockchain_certification_price': certification_price,
+    })
+    slide = env['slide.slide'].create({
+        'name': f"Certificación {tag}",
+        'channel_id': channel.id,
+        'slide_category': 'certification',
+        'survey_id': survey.id,
+        'blockchain_certifiable': True,
+        'is_published': True,
+    })
+    return survey, channel, slide, _create_partners(env, size, tag)
+
+
+def _benchmark_size(env, size, batch_size):
+    tag = f"{size}-{int(time.time())}"
+    survey, channel, slide, partners = _create_fixtures(env, size, tag)
+    question = survey.question_ids
+    correct = question.suggested_answer_ids.filtered('is_correct')
+    recorder = _PhaseRecorder(env.cr)
+    UserInput = env['survey.user_input']
+
+    with recorder.phase('enrollment'):
+        channel._action_add_members(partners)
+        channel.channel_partner_ids.filtered(
+            lambda cp: cp.partner_id in partners
+        ).write({'blockchain_certification_rights': True})
+        env.flush_all()
+
+    user_inputs = UserInput.create([
+        {'survey_id': survey.id, 'partner_id': partner.id, 'slide_id': slide.id, 'email': partner.email}
+        for partner in partners
+    ])
+    env['survey.user_input.line'].create([
+        {'user_input_id': user_input.id, 'survey_id': survey.id, 'question_id': question.id,
+         'answer_type': 'suggestion', 'suggested_answer_id': correct.id}
+        for user_input in user_inputs
+    ])
+    env.flush_all()
+
+    # Los alumnos terminan el examen de uno en uno y el pipeline drena la cola por lotes:
+    # la latencia de cada certificado va desde su _mark_done hasta que su correo sale.
+    start = time.perf_counter()
+    marked_at = {}
+    latencies = []
+    for offset in range(0, len(user_inputs), batch_size):
+        batch = user_inputs[offset:offset + batch_size]
+        with recorder.phase('mark_done'):
+            for user_input in batch:
+                user_input._mark_done()
+                env.flush_all()
+                marked_at[user_input.id] = time.perf_counter()
+        batch = batch.filtered(lambda ui: ui.blockchain_certificate_state == 'pending')
+        with recorder.phase('render_hash'):
+            batch._render_and_store_certificates()
+            batch.write({'blockchain_certificate_state': 'hashed'})
+            env.flush_all()
+        with recorder.phase('register'):
+            for user_input in batch:
+                try:
+                    user_input._advance_certificate_pipeline()
+                except Exception as e:
+                    user_input._schedule_certificate_retry(e)
+            env.flush_all()
+        with recorder.phase('mail'):
+            batch.filtered(
+                lambda ui: ui.blockchain_certificate_state == 'registered'
+                and ui.blockchain_confirmation_state == 'confirmed'
+            )._certificate_stage_mail()
+            env.flush_all()
+        mailed_at = time.perf_counter()
+        latencies += [
+            mailed_at - marked_at[user_input.id]
+            for user_input in batch if user_input.blockchain_certificate_state == 'mailed'
+        ]
+
+    elapsed = time.perf_counter() - start
+    return {
+        'size': size,
+        'certified': len(latencies),
+        'p50_seconds': _percentile(latencies, 50),
+        'p95_seconds': _percentile(latencies, 95),
+        'certificates_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'enrollments_per_second': size / recorder.phases['enrollment']['seconds'],
+        'phases': recorder.phases,
+    }
+
+
+def run_certification_benchmark(env, sizes=(1, 100, 10000), latency=0.05, failure_rate=0.0,
+                                batch_size=50, rollback=True):
+    """
+    Ejecuta el benchmark para cada tamaño y devuelve la lista de resultados.
+
+    :param latency: segundos por registro en el ledger simulado
+    :param failure_rate: probabilidad de fallo de cada registro
+    :param batch_size: tamaño de lote del pipeline (como 'pipeline_batch_size')
+    :param rollback: deshacer los datos creados al terminar
+    """
+    results = []
+    for size in sizes:
+        ledger = MockLedger(latency=latency, failure_rate=failure_rate, seed=size)
+        bench_env = env(context=dict(env.context, blockchain_mock_ledger=ledger, tracking_disable=True))
+        result = _benchmark_size(bench_env, size, batch_size)
+        result['ledger_calls'] = ledger.calls
+        result['ledger_failures'] = ledger.failures
+        results.append(result)
+        _logger.info(
+            "Benchmark %s intentos: %s certificados, p50 %.3fs, p95 %.3fs, %.1f cert/s, %.1f inscripciones/s",
+            size, result['certified'], result['p50_seconds'], result['p95_seconds'],
+            result['certificates_per_second'], result['enrollments_per_second'])
+        for name, stats in result['phases'].items():
+            _logger.info("  %-12s %8.3fs %8d consultas", name, stats['seconds'], stats['queries'])
+        if rollback:
+            env.cr.rollback()
+            env.invalidate_all()
+    return results
+
+
+def run_enrollment_benchmark(env, sizes=(1000, 10000, 100000), rollback=True):
+    """
+    Inscribe N alumnos de una vez en un curso público con certificación gratuita (precio 0),
+    el caso de una importación masiva: ``_action_add_members`` crea las inscripciones con
+    ``blockchain_certification_rights`` ya a True. Devuelve, por tamaño, inscripciones/s,
+    segundos y consultas SQL, y comprueba que todos los alumnos reciben el derecho.
+    """
+    results = []
+    for size in sizes:
+        tag = f"enroll-{size}-{int(time.time())}"
+        bench_env = env(context=dict(env.context, tracking_disable=True))
+        channel = bench_env['slide.channel'].create({
+            'name': f"Benchmark {tag}",
+            'enroll': 'public',
+            'blockchain_certification_enabled': True,
+            'blockchain_certification_price': 0.0,
+        })
+        partners = _create_partners(bench_env, size, tag)
+        bench_env.flush_all()
+
+        recorder = _PhaseRecorder(env.cr)
+        with recorder.phase('enrollment'):
+            channel._action_add_members(partners)
+            bench_env.flush_all()
+
+        with_rights = bench_env['slide.channel.partner'].sudo().search_count([
+            ('channel_id', '=', channel.id), ('blockchain_certification_rights', '=', True),
+        ])
+        stats = recorder.phases['enrollment']
+        result = {
+            'size': size,
+            'with_rights': with_rights,
+            'seconds': stats['seconds'],
+            'queries': stats['queries'],
+            'enrollments_per_second': size / stats['seconds'] if stats['seconds'] else 0.0,
+        }
+        results.append(result)
+        _logger.info("Inscripción de %s alumnos: %.2fs, %.0f inscripciones/s, %s consultas, %s con derechos",
+                     size, result['seconds'], result['enrollments_per_second'], result['queries'], with_rights)
+        if rollback:
+            env.cr.rollback()
+            env.invalidate_all()
+    return results
+
+
+def run_render_benchmark(env, survey, count=100):
+    """
+    Renderiza ``count`` certificados aprobados de ``survey`` con cada motor y devuelve
+    {motor: {'certificates_per_second', 'seconds', 'python_peak_kb', 'child_max_rss_kb'}}.
+    ``python_peak_kb`` es el pico de memoria Python del render (tracemalloc): para el motor de
+    superposición, que es Python puro, es toda su memoria. ``child_max_rss_kb`` solo se mide
+    para QWeb, el único motor que lanza procesos (wkhtmltopdf): es el pico de RSS de los hijos
+    del worker, que el kernel acumula durante toda su vida, así que es una cota superior.
+    Los datos de emisión se fijan con el motor de superposición dentro de un savepoint que
+    se deshace al terminar.
+    """
+    user_inputs = env['survey.user_input'].search([
+        ('survey_id', '=', survey.id), ('scoring_success', '=', True),
+    ], limit=count)
+    with env.cr.savepoint() as savepoint:
+        survey.certificate_render_engine = 'overlay'
+        user_inputs.blockchain_certificate_inputs = False
+        user_inputs._pin_certificate_inputs()
+        results = _run_render_engines(user_inputs)
+        savepoint.rollback()
+    env.invalidate_all()
+    return results
+
+
+def _run_render_engines(user_inputs):
+    # motor: (render, lanza procesos hijo)
+    engines = {
+        'qweb': (user_inputs._render_certificate_pdfs_qweb, True),
+        'overlay': (user_inputs._render_certificate_pdfs_overlay, False),
+    }
+    results = {}
+    for engine, (render, spawns_children) in engines.items():
+        tracemalloc.start()
+        start = time.perf_counter()
+        pdfs = render()
+        elapsed = time.perf_counter() - start
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[engine] = {
+            'certificates': len(pdfs),
+            'seconds': elapsed,
+            'certificates_per_second': len(pdfs) / elapsed if elapsed else 0.0,
+            'python_peak_kb': peak // 1024,
+            # Sin procesos hijo no hay nada que medir: RUSAGE_CHILDREN repetiría el pico de wkhtmltopdf
+            'child_max_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss if spawns_children else 0,
+        }
+        _logger.info("Render %s: %s certificados en %.2fs (%.1f cert/s), pico Python %s KB, pico hijos %s KB",
+                     engine, len(pdfs), elapsed, results[engine]['certificates_per_second'],
+                     results[engine]['python_peak_kb'], results[engine]['child_max_rss_kb'])
+    return results
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Almacenamiento en frío de certificados inmutables antiguos, fuera del filestore y de la
+base de datos. Dos backends intercambiables (parámetro
+``elearning_blockchain_certification.cold_storage_backend``):
+
+- ``pack`` (por defecto): un fichero de paquete por pasada del cron con los PDFs
+  comprimidos con zlib uno tras otro, más un índice JSON al lado. Pocos inodos y
+  ficheros que no cambian nunca una vez escritos (copias de seguridad incrementales baratas).
+- ``directory``: un fichero ``<sha256>.pdf.gz`` por certificado, repartido en
+  subdirectorios por prefijo, para montar un almacén de objetos como directorio local.
+
+Cada certificado archivado guarda un puntero (``pack:<paquete>:<offset>:<longitud>`` o
+``directory:<sha256>``); las lecturas pasan por una caché LRU en memoria por proceso.
+"""
+import gzip
+import json
+import os
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+
+from odoo.tools import config
+
+
+class ColdStorageError(Exception):
+    """Puntero inválido o contenido archivado ilegible."""
+
+
+class PackFileStore:
+    """Paquetes append-only: cada pasada escribe un paquete nuevo y nunca lo modifica."""
+
+    prefix = 'pack'
+
+    def __init__(self, root):
+        self.root = root
+
+    def put_many(self, items):
+        """Archiva [(sha256, bytes)] en un paquete nuevo y devuelve {sha256: puntero}."""
+        os.makedirs(self.root, exist_ok=True)
+        name = f"certificates-{uuid.uuid4().hex}.pack"
+        path = os.path.join(self.root, name)
+        index, pointers, offset = {}, {}, 0
+        with open(path + '.tmp', 'wb') as f:
+            for sha256, content in items:
+                compressed = zlib.compress(content)
+                f.write(compressed)
+                index[sha256] = [offset, len(compressed)]
+                pointers[sha256] = f"{self.prefix}:{name}:{offset}:{len(compressed)}"
+                offset += len(compressed)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(path + '.idx', 'w') as f:
+            json.dump(index, f)
+        os.replace(path + '.tmp', path)
+        return pointers
+
+    def get(self, pointer):
+        try:
+            _prefix, name, offset, length = pointer.split(':')
+            offset, length = int(offset), int(length)
+        except ValueError:
+            raise ColdStorageError("Puntero de paquete inválido: %s" % pointer)
+        if os.path.basename(name) != name:
+            raise ColdStorageError("Puntero de paquete inválido: %s" % pointer)
+        try:
+            with open(os.path.join(self.root, name), 'rb') as f:
+                f.seek(offset)
+                return zlib.decompress(f.read(length))
+        except (OSError, zlib.error) as e:
+            raise ColdStorageError("No se puede leer %s: %s" % (pointer, e))
+
+
+class DirectoryStore:
+    """Un fichero gzip por certificado: ``<raíz>/<sha256[:2]>/<sha256>.pdf.gz``."""
+
+    prefix = 'directory'
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, sha256):
+        if not sha256.isalnum():
+            raise ColdStorageError("Hash inválido: %s" % sha256)
+        return os.path.join(self.root, sha256[:2], sha256 + '.pdf.gz')
+
+    def put_many(self, items):
+        pointers = {}
+        for sha256, content in items:
+            path = self._path(sha256)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(gzip.compress(content, mtime=0))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+            pointers[sha256] = f"{self.prefix}:{sha256}"
+        return pointers
+
+    def get(self, pointer):
+        sha256 = pointer.partition(':')[2]
+        try:
+            with open(self._path(sha256), 'rb') as f:
+                return gzip.decompress(f.read())
+        except (OSError, gzip.BadGzipFile) as e:
+            raise ColdStorageError("No se puede leer %s: %s" % (pointer, e))
+
+
+COLD_STORES = {store.prefix: store for store in (PackFileStore, DirectoryStore)}
+
+
+class LRUCache:
+    """Caché LRU de contenidos limitada en bytes, segura entre hilos."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _key, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_rehydration_cache(env):
+    """Caché LRU del proceso para este tamaño (``cold_storage_cache_mb``, 64 MB)."""
+    max_bytes = int(env['ir.config_parameter'].sudo().get_param(
+        'elearning_blockchain_certification.cold_storage_cache_mb', 64)) * 1024 * 1024
+    with _caches_lock:
+        if max_bytes not in _caches:
+            _caches[max_bytes] = LRUCache(max_bytes)
+        return _caches[max_bytes]
+
+
+def get_cold_store(env, pointer=None):
+    """
+    Backend para archivar (el configurado) o para leer ``pointer`` (el de su prefijo).
+    La raíz es ``cold_storage_path`` o ``<data_dir>/certificate_archive/<base de datos>``.
+    """
+    ICP = env['ir.config_parameter'].sudo()
+    root = ICP.get_param('elearning_blockchain_certification.cold_storage_path') or os.path.join(
+        config['data_dir'], 'certificate_archive', env.cr.dbname)
+    backend = pointer.partition(':')[0] if pointer else ICP.get_param(
+        'elearning_blockchain_certification.cold_storage_backend', 'pack')
+    if backend not in COLD_STORES:
+        raise ColdStorageError("Backend de almacenamiento en frío desconocido: %s" % backend)
+    return COLD_STORES[backend](root)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Seguimiento de confirmaciones de las transacciones de registro de certificados.
+
+El cron consulta por lotes las transacciones pendientes con asyncio y concurrencia acotada
+contra un nodo intercambiable:
+
+- :class:`MockConfirmationNode`: en proceso, para desarrollo y benchmarks (se usa con el
+  ledger simulado o con la clave de contexto ``blockchain_confirmation_node``).
+- :class:`JsonRpcConfirmationNode`: nodo JSON-RPC compatible con Ethereum
+  (``eth_getTransactionReceipt`` / ``eth_blockNumber``), parámetro
+  ``elearning_blockchain_certification.confirmation_node_url``.
+"""
+import asyncio
+import json
+import logging
+import urllib.request
+
+_logger = logging.getLogger(__name__)
+
+# Valor devuelto por el nodo para una transacción revertida (nunca se confirmará)
+TX_REVERTED = -1
+
+
+class ConfirmationNode:
+    """
+    Interfaz del nodo: número de confirmaciones de una transacción, None si no se conoce
+    (error de red, nodo caído) o TX_REVERTED si la transacción se ha revertido.
+    """
+
+    async def get_confirmations(self, tx_reference):
+        raise NotImplementedError
+
+
+class MockConfirmationNode(ConfirmationNode):
+    """
+    Nodo en memoria: toda transacción tiene ``confirmations`` confirmaciones tras ``latency``
+    segundos, salvo las fijadas en ``overrides`` ({tx_reference: confirmaciones}).
+    """
+
+    def __init__(self, confirmations=12, latency=0.0, overrides=None):
+        self.confirmations = confirmations
+        self.latency = latency
+        self.overrides = dict(overrides or {})
+        self.calls = 0
+
+    async def get_confirmations(self, tx_reference):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.overrides.get(tx_reference, self.confirmations)
+
+
+class JsonRpcConfirmationNode(ConfirmationNode):
+    """Nodo JSON-RPC de tipo Ethereum; la altura de la cadena se consulta una vez por pasada."""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self._head = None
+        self._head_lock = None
+
+    def _call(self, method, params):
+        payload = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params}).encode()
+        http_request = urllib.request.Request(self.url, data=payload, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+            result = json.loads(response.read())
+        if result.get('error'):
+            raise RuntimeError(result['error'])
+        return result.get('result')
+
+    async def _get_head(self):
+        if self._head_lock is None:
+            self._head_lock = asyncio.Lock()
+        async with self._head_lock:
+            if self._head is None:
+                self._head = int(await asyncio.to_thread(self._call, 'eth_blockNumber', []), 16)
+        return self._head
+
+    async def get_confirmations(self, tx_reference):
+        receipt = await asyncio.to_thread(self._call, 'eth_getTransactionReceipt', [tx_reference])
+        if not receipt or not receipt.get('blockNumber'):
+            return 0
+        if receipt.get('status') == '0x0':
+            return TX_REVERTED
+        return max(await self._get_head() - int(receipt['blockNumber'], 16) + 1, 0)
+
+
+async def _poll_confirmations(node, tx_references, concurrency):
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def poll(tx_reference):
+        async with semaphore:
+            try:
+                return tx_reference, await node.get_confirmations(tx_reference)
+            except Exception as e:
+                _logger.warning("No se pudo consultar la transacción %s: %s", tx_reference, e)
+                return tx_reference, None
+
+    return dict(await asyncio.gather(*(poll(tx_reference) for tx_reference in tx_references)))
+
+
+def poll_confirmations(node, tx_references, concurrency=16):
+    """
+    Confirmaciones de cada transacción, {tx_reference: int | TX_REVERTED | None},
+    con 'concurrency' consultas a la vez.
+    """
+    if not tx_references:
+        return {}
+    return asyncio.run(_poll_confirmations(node, list(tx_references), concurrency))
+
+
+def get_confirmation_node(env):
+    """Nodo con el que seguir las confirmaciones, o None si el seguimiento está desactivado."""
+    node = env.context.get('blockchain_confirmation_node')
+    if node is not None:
+        return node
+    ICP = env['ir.config_parameter'].sudo()
+    url = ICP.get_param('elearning_blockchain_certification.confirmation_node_url')
+    if url:
+        return JsonRpcConfirmationNode(url)
+    if ICP.get_param('elearning_blockchain_certification.ledger_backend', 'core') == 'mock':
+        return MockConfirmationNode(confirmations=get_confirmation_depth(env))
+    return None
+
+
+def get_confirmation_depth(env):
+    """Confirmaciones necesarias para dar una transacción por confirmada."""
+    return int(env['ir.config_parameter'].sudo().get_param(
+        'elearning_blockchain_certification.confirmation_depth', 12))
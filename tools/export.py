@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Serialización en streaming de las pruebas de certificados (CSV y JSON) y codificación
+compacta de selecciones de ids por rangos ("1-500,612,700-720") para la URL de exportación.
+"""
+import csv
+import io
+import json
+
+PROOF_COLUMNS = (
+    'id', 'survey', 'partner', 'issued_on', 'hash', 'mode', 'status',
+    'tx_reference', 'confirmed_on', 'anchor', 'merkle_root', 'leaf_index', 'proof',
+)
+# Prefijos con los que una hoja de cálculo interpreta la celda como fórmula
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def encode_id_ranges(ids):
+    ranges = []
+    for record_id in sorted(set(ids)):
+        if ranges and ranges[-1][1] == record_id - 1:
+            ranges[-1][1] = record_id
+        else:
+            ranges.append([record_id, record_id])
+    return ','.join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def decode_id_ranges(value):
+    """
+    Inversa de encode_id_ranges, sin expandir los rangos: devuelve [(inicio, fin)].
+    Lanza ValueError si el formato no es válido.
+    """
+    ranges = []
+    for part in filter(None, (value or '').split(',')):
+        start, _sep, end = part.partition('-')
+        start, end = int(start), int(end or start)
+        if end < start:
+            raise ValueError(part)
+        ranges.append((start, end))
+    return ranges
+
+
+def _escape_csv_cell(value):
+    """Neutraliza textos como el título o el nombre del alumno que una hoja de cálculo ejecutaría como fórmula."""
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(rows):
+    """
+    Genera el CSV línea a línea; la prueba Merkle va como JSON en su columna.
+    Las celdas de texto que empiezan por =, +, -, @, tabulador o retorno de carro llevan
+    delante un apóstrofo para que una hoja de cálculo no las evalúe.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=PROOF_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        row = {key: _escape_csv_cell(value) for key, value in row.items()}
+        writer.writerow(dict(row, proof=json.dumps(row['proof']) if row.get('proof') else ''))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def iter_json(rows):
+    """Genera un array JSON elemento a elemento."""
+    yield b'['
+    separator = b''
+    for row in rows:
+        yield separator + json.dumps(row, ensure_ascii=False).encode()
+        separator = b','
+    yield b']'
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Ledger simulado en proceso para desarrollo y benchmarks.
+
+Sustituye la llamada a ``action_blockchain_register`` del core blockchain por un registro
+en memoria con latencia y tasa de fallos configurables, de modo que el coste del módulo
+por certificado se pueda medir sin depender de un nodo real.
+
+Se activa de dos formas:
+
+- Clave de contexto ``blockchain_mock_ledger`` con una instancia de :class:`MockLedger`
+  (la usa ``tools/benchmark.py``).
+- Parámetro de sistema ``elearning_blockchain_certification.ledger_backend = mock``, con
+  ``ledger_mock_latency_ms`` y ``ledger_mock_failure_rate``; la instancia se comparte
+  en el proceso.
+"""
+import hashlib
+import random
+import threading
+import time
+
+from .metrics import span
+
+
+class LedgerError(Exception):
+    """Fallo simulado del ledger (equivalente a un error de red o de nodo)."""
+
+
+class MockLedger:
+    """
+    Ledger en memoria: ``register`` espera ``latency`` segundos, falla con probabilidad
+    ``failure_rate`` y devuelve un identificador de transacción determinista.
+    Una clave de idempotencia ya vista devuelve la transacción original sin registrar de nuevo.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.entries = {}
+        self.idempotency_keys = {}
+        self.calls = 0
+        self.failures = 0
+
+    def register(self, payload_hash, idempotency_key=None):
+        with self._lock:
+            if idempotency_key and idempotency_key in self.idempotency_keys:
+                return self.idempotency_keys[idempotency_key]
+            self.calls += 1
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise LedgerError("Fallo simulado del ledger registrando %s" % payload_hash)
+        tx_id = hashlib.sha256(b'mock-ledger:' + payload_hash.encode()).hexdigest()
+        with self._lock:
+            self.entries[payload_hash] = tx_id
+            if idempotency_key:
+                self.idempotency_keys[idempotency_key] = tx_id
+        return tx_id
+
+
+_shared_ledgers = {}
+_shared_ledgers_lock = threading.Lock()
+
+
+def get_ledger(env):
+    """Ledger simulado activo para este entorno, o None si se usa el core blockchain."""
+    ledger = env.context.get('blockchain_mock_ledger')
+    if ledger is not None:
+        return ledger
+    ICP = env['ir.config_parameter'].sudo()
+    if ICP.get_param('elearning_blockchain_certification.ledger_backend', 'core') != 'mock':
+        return None
+    latency = float(ICP.get_param('elearning_blockchain_certification.ledger_mock_latency_ms', 0)) / 1000
+    failure_rate = float(ICP.get_param('elearning_blockchain_certification.ledger_mock_failure_rate', 0))
+    with _shared_ledgers_lock:
+        key = (env.cr.dbname, latency, failure_rate)
+        if key not in _shared_ledgers:
+            _shared_ledgers[key] = MockLedger(latency=latency, failure_rate=failure_rate)
+        return _shared_ledgers[key]
+
+
+def register_on_ledger(record, idempotency_key=None):
+    """
+    Registra el hash del registro (hook ``_compute_blockchain_hash`` del mixin) en el ledger
+    simulado si está activo; si no, delega en ``action_blockchain_register`` del core.
+    ``idempotency_key`` se pasa al core en el contexto (``blockchain_idempotency_key``).
+    Guarda la referencia de la transacción para el seguimiento de confirmaciones.
+    """
+    record.ensure_one()
+    with span('chain_registration'):
+        ledger = get_ledger(record.env)
+        if ledger is None:
+            if idempotency_key:
+                record = record.with_context(blockchain_idempotency_key=idempotency_key)
+            result = record.action_blockchain_register()
+            record.write(record._get_blockchain_submission_vals(record._get_blockchain_tx_reference()))
+            return result
+        payload_hash = record._compute_blockchain_hash()
+        tx_reference = ledger.register(payload_hash, idempotency_key=idempotency_key)
+        record.write(dict(record._get_blockchain_submission_vals(tx_reference), blockchain_hash=payload_hash))
+        return True
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Árbol Merkle SHA-256 para anclar lotes de certificados con una sola transacción.
+
+Las hojas son los hashes SHA-256 (hex) de los PDF inmutables. Se aplica separación
+de dominio (prefijo 0x00 para hojas y 0x01 para nodos internos) y un nodo sin pareja
+se promociona tal cual al nivel superior, evitando el problema de duplicar la última hoja.
+"""
+import hashlib
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def _hash_leaf(leaf_hex):
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(leaf_hex)).digest()
+
+
+def _hash_node(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_merkle_tree(leaves_hex):
+    """
+    Construye el árbol y devuelve ``(root_hex, proofs)``.
+
+    ``proofs[i]`` es la prueba de inclusión de la hoja ``i``: una lista de pares
+    ``[lado, hermano_hex]`` desde la hoja hasta la raíz, donde ``lado`` es ``'L'``
+    si el hermano va a la izquierda y ``'R'`` si va a la derecha.
+    """
+    if not leaves_hex:
+        raise ValueError("No se puede construir un árbol Merkle sin hojas.")
+
+    level = [_hash_leaf(leaf) for leaf in leaves_hex]
+    # Posición actual de cada hoja en el nivel que se está procesando
+    positions = list(range(len(level)))
+    proofs = [[] for _ in leaves_hex]
+
+    while len(level) > 1:
+        for leaf_index, pos in enumerate(positions):
+            sibling = pos ^ 1
+            if sibling < len(level):
+                side = 'L' if sibling < pos else 'R'
+                proofs[leaf_index].append([side, level[sibling].hex()])
+        next_level = [
+            _hash_node(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+        positions = [pos // 2 for pos in positions]
+        level = next_level
+
+    return level[0].hex(), proofs
+
+
+def verify_merkle_proof(leaf_hex, proof, root_hex):
+    """Comprueba que ``leaf_hex`` pertenece al árbol con raíz ``root_hex``."""
+    node = _hash_leaf(leaf_hex)
+    for side, sibling_hex in proof:
+        sibling = bytes.fromhex(sibling_hex)
+        node = _hash_node(sibling, node) if side == 'L' else _hash_node(node, sibling)
+    return node.hex() == root_hex
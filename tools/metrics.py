@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas de la emisión de certificados: contadores e histogramas de latencia por etapa,
+expuestos en formato de texto de Prometheus por ``/certificate/metrics``.
+
+Cada proceso acumula sus muestras en memoria y las vuelca, tras cada actualización, a su
+propio fichero JSON en un directorio compartido (``<data_dir>/certificate_metrics``), como
+el modo multiproceso de prometheus_client. El scrape suma los ficheros de todos los
+procesos: las etapas que corren en los workers de cron aparecen aunque responda un
+worker HTTP. Los ficheros de procesos terminados se conservan para que los contadores no
+retrocedan.
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'elearning_certificate'
+# Límites superiores (segundos) de los buckets de latencia por etapa
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    'stage_duration_seconds': ('histogram', "Duración de cada etapa de la emisión de certificados."),
+    'stage_total': ('counter', "Certificados procesados por cada etapa, por resultado."),
+    'download_total': ('counter', "Descargas de certificados por origen (inmutable, archivado o dinámico)."),
+    'pipeline_queue': ('gauge', "Participaciones en cada estado del pipeline de emisión."),
+}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{%s}' % ','.join(escaped)
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """Contadores e histogramas con etiquetas, seguros entre hilos y volcados a un fichero por proceso."""
+
+    def __init__(self, buckets=STAGE_BUCKETS, directory=None):
+        self.buckets = buckets
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._pid = None
+        self._filename = None
+
+    def get_directory(self):
+        return self.directory or os.path.join(config['data_dir'], 'certificate_metrics')
+
+    def _ensure_process(self):
+        # Tras un fork el hijo hereda las muestras del padre: empieza de cero con su propio fichero
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._filename = f"{self._pid}-{uuid.uuid4().hex}.json"
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _flush(self):
+        """Vuelca las muestras del proceso a su fichero (escritura atómica). Llamar con el lock tomado."""
+        directory = self.get_directory()
+        path = os.path.join(directory, self._filename)
+        data = {
+            'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+            'histograms': [[name, labels, histogram] for (name, labels), histogram in self._histograms.items()],
+        }
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(data, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            _logger.warning("No se pudieron volcar las métricas de certificados en %s: %s", path, e)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._ensure_process()
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._flush()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._ensure_process()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+            self._flush()
+
+    def collect(self):
+        """Suma las muestras de los ficheros de todos los procesos: ({clave: valor}, {clave: histograma})."""
+        counters, histograms = {}, {}
+        for path in glob.glob(os.path.join(self.get_directory(), '*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                _logger.warning("Fichero de métricas ilegible %s: %s", path, e)
+                continue
+            for name, labels, value in data.get('counters', []):
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, sample in data.get('histograms', []):
+                if len(sample['buckets']) != len(self.buckets):
+                    continue
+                key = (name, tuple(tuple(label) for label in labels))
+                histogram = histograms.setdefault(key, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+                histogram['buckets'] = [a + b for a, b in zip(histogram['buckets'], sample['buckets'])]
+                histogram['sum'] += sample['sum']
+                histogram['count'] += sample['count']
+        return counters, histograms
+
+    def render(self, extra_gauges=None):
+        """
+        Serializa en formato de texto de Prometheus 0.0.4 las métricas agregadas de todos los procesos.
+        ``extra_gauges``: {nombre: [(etiquetas_dict, valor)]} calculados en el momento del scrape.
+        """
+        counters, histograms = self.collect()
+        counters, histograms = sorted(counters.items()), sorted(histograms.items())
+
+        lines = []
+        described = set()
+
+        def describe(name, metric_type, help_text):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+
+        for (name, labels), value in counters:
+            metric_type, help_text = METRIC_HELP.get(name, ('counter', name))
+            describe(name, metric_type, help_text)
+            lines.append(f"{METRIC_PREFIX}_{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), histogram in histograms:
+            metric_type, help_text = METRIC_HELP.get(name, ('histogram', name))
+            describe(name, metric_type, help_text)
+            for bound, count in zip(self.buckets, histogram['buckets']):
+                lines.append(f"{METRIC_PREFIX}_{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{METRIC_PREFIX}_{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} "
+                         f"{histogram['count']}")
+            lines.append(f"{METRIC_PREFIX}_{name}_sum{_format_labels(labels)} {histogram['sum']!r}")
+            lines.append(f"{METRIC_PREFIX}_{name}_count{_format_labels(labels)} {histogram['count']}")
+
+        for name, samples in (extra_gauges or {}).items():
+            metric_type, help_text = METRIC_HELP.get(name, ('gauge', name))
+            describe(name, metric_type, help_text)
+            for labels, value in samples:
+                lines.append(f"{METRIC_PREFIX}_{name}{_format_labels(tuple(sorted(labels.items())))} "
+                             f"{_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def span(stage, size=1):
+    """
+    Mide la duración de una etapa y cuenta su resultado ('ok' o 'error').
+    ``size``: certificados procesados en la etapa (las etapas por lotes cuentan todos).
+    """
+    start = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        metrics.observe('stage_duration_seconds', time.perf_counter() - start, stage=stage)
+        metrics.inc('stage_total', size, stage=stage, outcome=outcome)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de certificados por superposición: estampa los campos variables (alumno, encuesta,
+puntuación, fecha, referencia y QR de verificación) sobre un PDF de fondo precargado,
+en Python y sin lanzar wkhtmltopdf.
+
+Solo usa fuentes estándar PDF (Helvetica), que no se incrustan: el resultado no depende
+de las fuentes instaladas en el servidor. Con el mismo fondo, textos, layout y metadatos
+la salida es idéntica byte a byte (reportlab en modo ``invariant`` y metadatos explícitos),
+de modo que el hash registrado se puede recalcular regenerando el PDF.
+"""
+import io
+import math
+
+from reportlab.graphics import renderPDF
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
+from reportlab.pdfgen import canvas
+
+from odoo.tools.pdf import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject, \
+    PdfFileReader, PdfFileWriter
+
+# Posición de cada campo en fracciones del ancho/alto de la página (origen abajo a la izquierda)
+DEFAULT_LAYOUT = {
+    'partner': {'x': 0.5, 'y': 0.55, 'font': 'Helvetica-Bold', 'size': 28},
+    'survey': {'x': 0.5, 'y': 0.45, 'font': 'Helvetica', 'size': 18},
+    'score': {'x': 0.5, 'y': 0.38, 'font': 'Helvetica', 'size': 12},
+    'date': {'x': 0.5, 'y': 0.33, 'font': 'Helvetica', 'size': 12},
+    'reference': {'x': 0.5, 'y': 0.06, 'font': 'Helvetica', 'size': 7},
+    'qr': {'x': 0.86, 'y': 0.06, 'size': 0.11},
+}
+# Productor fijo: cambiarlo altera los bytes (y el hash) de los certificados regenerados.
+# Versión 2: capa como Form XObject (la 1 usaba mergePage, que renombra con uuid4 los recursos en conflicto).
+OVERLAY_PRODUCER = 'elearning_blockchain_certification overlay 2'
+# Nombre del Form XObject con la capa en los recursos de la página de fondo
+OVERLAY_XOBJECT = 'BlockchainOverlay'
+
+
+def get_page_size(background):
+    """(ancho, alto) en puntos de la primera página del fondo."""
+    box = PdfFileReader(io.BytesIO(background), strict=False).getPage(0).mediaBox
+    return float(box.getWidth()), float(box.getHeight())
+
+
+def _draw_overlay(page_size, values, layout):
+    width, height = page_size
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=page_size, invariant=1, pageCompression=1)
+    for key, text in values.items():
+        style = layout.get(key)
+        if key == 'qr' or not style or not text:
+            continue
+        pdf.setFont(style['font'], style['size'])
+        pdf.drawCentredString(width * style['x'], height * style['y'], text)
+
+    qr_style = layout.get('qr')
+    if qr_style and values.get('qr'):
+        widget = QrCodeWidget(values['qr'])
+        x1, y1, x2, y2 = widget.getBounds()
+        side = width * qr_style['size']
+        drawing = Drawing(side, side, transform=[side / (x2 - x1), 0, 0, side / (y2 - y1), 0, 0])
+        drawing.add(widget)
+        renderPDF.draw(drawing, pdf, width * qr_style['x'] - side / 2, height * qr_style['y'])
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def _add_stream(writer, data, compress=False, **entries):
+    stream = DecodedStreamObject()
+    stream.setData(data)
+    if compress:
+        stream = stream.flateEncode()
+    stream.update({NameObject(key): value for key, value in entries.items()})
+    return writer._addObject(stream)
+
+
+def _add_overlay_xobject(writer, page, overlay, page_size):
+    """
+    Dibuja ``overlay`` sobre ``page`` como Form XObject: los nombres de sus recursos quedan
+    dentro del formulario y no chocan con los del fondo. El contenido del fondo se envuelve
+    en q/Q para que su estado gráfico no afecte a la capa.
+    """
+    width, height = page_size
+    form = _add_stream(
+        writer, overlay['/Contents'].getObject().getData(), compress=True,
+        **{
+            '/Type': NameObject('/XObject'),
+            '/Subtype': NameObject('/Form'),
+            '/BBox': ArrayObject([NumberObject(0), NumberObject(0),
+                                  NumberObject(math.ceil(width)), NumberObject(math.ceil(height))]),
+            '/Resources': overlay['/Resources'],
+        })
+
+    resources = page['/Resources'] if '/Resources' in page else DictionaryObject()
+    xobjects = resources['/XObject'] if '/XObject' in resources else DictionaryObject()
+    name = '/' + OVERLAY_XOBJECT
+    while name in xobjects:
+        name += '_'
+    xobjects[NameObject(name)] = form
+    resources[NameObject('/XObject')] = xobjects
+    page[NameObject('/Resources')] = resources
+
+    contents = page.raw_get('/Contents') if '/Contents' in page else ArrayObject()
+    if isinstance(contents.getObject(), ArrayObject):
+        contents = list(contents.getObject())
+    else:
+        # Los flujos de contenido de un array tienen que ser objetos indirectos
+        contents = [contents if hasattr(contents, 'idnum') else writer._addObject(contents)]
+    page[NameObject('/Contents')] = ArrayObject(
+        [_add_stream(writer, b'q\n')] + contents + [_add_stream(writer, f"\nQ\nq {name} Do Q\n".encode())])
+
+
+def stamp_certificate(background, values, page_size=None, layout=None, metadata=None):
+    """
+    Devuelve el PDF del certificado: la primera página del fondo con los ``values``
+    ({campo del layout: texto}) estampados encima. ``metadata`` ({'/Clave': valor}) sustituye
+    los metadatos por defecto del documento, que de otro modo dependen de la librería.
+    La capa se añade como Form XObject con sus propios recursos en lugar de con mergePage:
+    al fusionar, PyPDF2 renombra con uuid4 los recursos en conflicto (p. ej. la fuente /F1
+    del fondo y de la capa) y dos renders idénticos darían bytes distintos.
+    """
+    layout = layout or DEFAULT_LAYOUT
+    page_size = page_size or get_page_size(background)
+    page = PdfFileReader(io.BytesIO(background), strict=False).getPage(0)
+    overlay = PdfFileReader(io.BytesIO(_draw_overlay(page_size, values, layout)), strict=False).getPage(0)
+
+    writer = PdfFileWriter()
+    writer.addPage(page)
+    _add_overlay_xobject(writer, page, overlay, page_size)
+    writer.addMetadata(metadata or {'/Producer': OVERLAY_PRODUCER})
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()